@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+bench_step2_bookkeeping.py
+---------------------------------
+Μέτρηση χρόνου για το «λογιστικό» κομμάτι του Βήματος 2 (χωρίς την αναζήτηση):
+  • scope_step2 (step_2_helpers_FIXED)
+  • finalize_step2_assignments (step2_finalize)
+Συγκρίνει με τις παλιές υλοποιήσεις ανά γραμμή (iterrows / φίλτρο ανά μαθητή) σε
+συνθετικά ρόστερ και ελέγχει ότι τα αποτελέσματα είναι ίδια.
+
+CLI: python bench_step2_bookkeeping.py [--rows 100 500 2000] [--repeat 3] [--seed 42]
+"""
+from __future__ import annotations
+import argparse
+import random
+import time
+from typing import Callable, List, Set
+
+import numpy as np
+import pandas as pd
+
+from step_2_helpers_FIXED import scope_step2
+from step2_finalize import finalize_step2_assignments
+
+
+def make_roster(n: int, seed: int = 42) -> pd.DataFrame:
+    """Συνθετικό ρόστερ n μαθητών: ~15% ζωηροί, ~10% ιδιαιτερότητες, ~50% τοποθετημένοι."""
+    rng = random.Random(seed)
+    num_classes = max(2, -(-n // 25))
+    labels = [f"Α{i+1}" for i in range(num_classes)]
+    yn = lambda p: "Ν" if rng.random() < p else "Ο"
+    return pd.DataFrame({
+        "ΟΝΟΜΑ": [f"ΜΑΘΗΤΗΣ_{i}" for i in range(n)],
+        "ΖΩΗΡΟΣ": [yn(0.15) for _ in range(n)],
+        "ΙΔΙΑΙΤΕΡΟΤΗΤΑ": [yn(0.10) for _ in range(n)],
+        "ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ": [yn(0.05) for _ in range(n)],
+        "ΒΗΜΑ2_ΣΕΝΑΡΙΟ_1": [rng.choice(labels) if rng.random() < 0.5 else np.nan for _ in range(n)],
+    })
+
+
+def _legacy_scope_step2(df: pd.DataFrame, step1_col: str) -> Set[str]:
+    s = set()
+    for _, r in df.iterrows():
+        placed = pd.notna(r.get(step1_col))
+        z = str(r.get("ΖΩΗΡΟΣ", "")).strip() == "Ν"
+        i = str(r.get("ΙΔΙΑΙΤΕΡΟΤΗΤΑ", "")).strip() == "Ν"
+        pk = str(r.get("ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ", "")).strip() == "Ν"
+        if (not placed and (z or i)) or (placed and pk):
+            s.add(str(r.get("ΟΝΟΜΑ", "")).strip())
+    return s
+
+
+def _legacy_finalize_writes(df: pd.DataFrame, col: str) -> pd.DataFrame:
+    result_df = df.copy()
+    final_col = "ΤΕΛΙΚΟ_ΤΜΗΜΑ_ΣΕΝΑΡΙΟ_1"
+    result_df[final_col] = result_df[col].copy()
+    unplaced_mask = pd.isna(result_df[final_col])
+    placed_classes = result_df[~unplaced_mask][final_col].value_counts()
+    classes_by_size = placed_classes.sort_values().index.tolist()
+    for i, student_name in enumerate(result_df[unplaced_mask]["ΟΝΟΜΑ"].tolist()):
+        student_idx = result_df[result_df["ΟΝΟΜΑ"] == student_name].index[0]
+        result_df.loc[student_idx, final_col] = classes_by_size[i % len(classes_by_size)]
+    return result_df
+
+
+def _best_time(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(rows: List[int], repeat: int = 3, seed: int = 42) -> None:
+    print(f"{'rows':>6} | {'scope παλιό':>12} {'scope νέο':>10} | {'finalize παλιό':>15} {'finalize νέο':>13}")
+    for n in rows:
+        df = make_roster(n, seed)
+        col = "ΒΗΜΑ2_ΣΕΝΑΡΙΟ_1"
+        if scope_step2(df, col) != _legacy_scope_step2(df, col):
+            raise AssertionError(f"scope_step2: διαφορετικό αποτέλεσμα για {n} γραμμές")
+        new_df, _stats = finalize_step2_assignments(df, col)
+        pd.testing.assert_frame_equal(new_df, _legacy_finalize_writes(df, col))
+
+        t_scope_old = _best_time(lambda: _legacy_scope_step2(df, col), repeat)
+        t_scope_new = _best_time(lambda: scope_step2(df, col), repeat)
+        t_fin_old = _best_time(lambda: _legacy_finalize_writes(df, col), repeat)
+        t_fin_new = _best_time(lambda: finalize_step2_assignments(df, col), repeat)
+        print(f"{n:>6} | {t_scope_old * 1000:>10.1f}ms {t_scope_new * 1000:>8.1f}ms | "
+              f"{t_fin_old * 1000:>13.1f}ms {t_fin_new * 1000:>11.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark: scope_step2 / finalize_step2_assignments.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 500, 2000],
+                        help="Μεγέθη ρόστερ (default: 100 500 2000).")
+    parser.add_argument("--repeat", type=int, default=3, help="Επαναλήψεις ανά μέτρηση (default: 3).")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42).")
+    args = parser.parse_args()
+    main(args.rows, repeat=args.repeat, seed=args.seed)
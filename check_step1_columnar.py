@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+check_step1_columnar.py
+---------------------------------
+Έλεγχος round-trip του columnar export του Βήματος 1 (export_columnar → read_step1_columnar)
+απέναντι στο multi-sheet export (export_exact_multisheet), για τιμές που το pandas δίνει
+συχνά σε ρόστερ: NaT, pd.NA (Int64), ±inf, κείμενο τύπου URL, ημερομηνίες, κενά.
+
+Για κάθε σενάριο k, το frame βάση + ΒΗΜΑ1_ΣΕΝΑΡΙΟ_k πρέπει να είναι ίδιο με το φύλλο
+ΒΗΜΑ1_ΣΕΝΑΡΙΟ_k του multi-sheet αρχείου. Κανένα κελί δεν πρέπει να γραφτεί ως hyperlink.
+
+CLI: python check_step1_columnar.py
+"""
+from __future__ import annotations
+import datetime as dt
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from step1_immutable_ALLINONE import export_columnar, export_exact_multisheet, read_step1_columnar
+
+
+def make_frame() -> pd.DataFrame:
+    """Ρόστερ με στήλες σεναρίων και «δύσκολες» τιμές σε κάθε τύπο στήλης."""
+    return pd.DataFrame({
+        "ΟΝΟΜΑ": ["ΜΑΘΗΤΗΣ_1", "ΜΑΘΗΤΗΣ_2", "ΜΑΘΗΤΗΣ_3", "ΜΑΘΗΤΗΣ_4"],
+        "ΗΜΕΡΟΜΗΝΙΑ": pd.to_datetime(["2015-01-02", None, "2015-03-04 05:06:07", "2015-12-31"], format="mixed"),
+        "ΗΜΕΡΑ": [dt.date(2015, 1, 1), None, dt.date(2015, 2, 2), dt.date(2015, 3, 3)],
+        "ΑΡΙΘΜΟΣ": pd.array([1, None, 3, 4], dtype="Int64"),
+        "ΒΑΘΜΟΣ": [1.5, np.inf, -np.inf, np.nan],
+        "ΣΥΝΔΕΣΜΟΣ": ["http://example.gr/a", "www.example.com", "mailto:a@example.gr", ""],
+        "ΦΙΛΟΙ": ["ΜΑΘΗΤΗΣ_2", None, "", "ΜΑΘΗΤΗΣ_1, ΜΑΘΗΤΗΣ_3"],
+        "ΒΗΜΑ1_ΣΕΝΑΡΙΟ_1": ["Α1", "", "Α2", ""],
+        "ΒΗΜΑ1_ΣΕΝΑΡΙΟ_2": ["Α2", "", "Α1", ""],
+    })
+
+
+def _hyperlink_count(path: Path) -> int:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path)
+    try:
+        return sum(1 for ws in wb.worksheets for row in ws.iter_rows() for cell in row if cell.hyperlink)
+    finally:
+        wb.close()
+
+
+def main() -> None:
+    df = make_frame()
+    scenario_cols = [c for c in df.columns if c.startswith("ΒΗΜΑ1_ΣΕΝΑΡΙΟ_")]
+    base_cols = [c for c in df.columns if c not in scenario_cols]
+    with tempfile.TemporaryDirectory() as tmp:
+        multi_path = Path(tmp) / "multisheet.xlsx"
+        col_path = Path(tmp) / "columnar.xlsx"
+        export_exact_multisheet(df, str(multi_path))
+        export_columnar(df, str(col_path))
+
+        combined = read_step1_columnar(str(col_path))
+        if combined is None:
+            raise AssertionError("read_step1_columnar: το columnar αρχείο δεν αναγνωρίστηκε")
+        sheets = pd.read_excel(multi_path, sheet_name=None)
+        for col in scenario_cols:
+            pd.testing.assert_frame_equal(combined[base_cols + [col]], sheets[col])
+        links = _hyperlink_count(col_path)
+        if links:
+            raise AssertionError(f"export_columnar: {links} κελιά γράφτηκαν ως hyperlink")
+    print(f"OK: {len(scenario_cols)} σενάρια, columnar == multisheet ({len(df)} γραμμές)")
+
+
+if __name__ == "__main__":
+    main()
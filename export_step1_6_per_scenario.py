@@ -7,6 +7,7 @@ export_step1_6_per_scenario.py — ΔΙΟΡΘΩΜΕΝΟΣ exporter (1→6)
     build_step1_6_per_scenario(input_excel, output_excel, pick_step4="best")
 
 Τρέχει ΟΛΟΚΛΗΡΗ τη ροή: Βήματα 1→6
+(η είσοδος μπορεί να είναι και columnar export του Βήματος 1: ΒΑΣΗ + ΒΗΜΑ1_ΣΕΝΑΡΙΑ)
 """
 
 from typing import Optional, List, Tuple
@@ -54,10 +55,12 @@ def build_step1_6_per_scenario(input_excel: str, output_excel: str, pick_step4:
         m_step4.count_groups_by_category_per_class_strict = _count_wrapper
 
     xls = pd.ExcelFile(input_excel)
-    df0 = xls.parse(xls.sheet_names[0])
 
-    # STEP 1
-    df1, _ = m_step1.create_immutable_step1(df0, num_classes=None)
+    # STEP 1 (αν η είσοδος είναι ήδη columnar export του Βήματος 1, τα σενάρια είναι κλειδωμένα)
+    df1 = m_step1.read_step1_columnar(xls)
+    if df1 is None:
+        df0 = xls.parse(xls.sheet_names[0])
+        df1, _ = m_step1.create_immutable_step1(df0, num_classes=None)
 
     # Κενά -> NaN
     for c in [c for c in df1.columns if str(c).startswith("ΒΗΜΑ1_ΣΕΝΑΡΙΟ_")]:
@@ -3,8 +3,8 @@
 run_step2_full_export.py
 ---------------------------------
 Ασφαλές για import (δεν "τρέχει" αυτόματα). Παρέχει:
-  • main(step1_workbook_path, out_xlsx_path, seed=42, max_results=5, sheet_naming="ΣΕΝΑΡΙΟ_{id}")
-  • CLI: python run_step2_full_export.py -i <STEP1.xlsx> -o <STEP2.xlsx> [--seed 42] [--max-results 5] [--sheet-naming "ΣΕΝΑΡΙΟ_{id}"]
+  • main(step1_workbook_path, out_xlsx_path, seed=42, max_results=5, sheet_naming="ΣΕΝΑΡΙΟ_{id}", workers=1)
+  • CLI: python run_step2_full_export.py -i <STEP1.xlsx> -o <STEP2.xlsx> [--seed 42] [--max-results 5] [--sheet-naming "ΣΕΝΑΡΙΟ_{id}"] [--workers 1]
 
 Επιστρέφει/γράφει το αρχείο STEP2 (ένα φύλλο ανά σενάριο) με τις στήλες του αρχικού + ΒΗΜΑ2_ΣΕΝΑΡΙΟ_N αμέσως δεξιά από ΒΗΜΑ1_ΣΕΝΑΡΙΟ_N.
 """
@@ -22,6 +22,7 @@ def main(
     seed: int = 42,
     max_results: int = 5,
     sheet_naming: str = "ΣΕΝΑΡΙΟ_{id}",
+    workers: int = 1,
 ) -> None:
     """
     Τρέχει τον πλήρη exporter του Βήματος 2.
@@ -32,6 +33,7 @@ def main(
         seed: Τυχαίος seed για αναπαραγωγιμότητα όπου χρησιμοποιείται.
         max_results: Μέγιστος αριθμός σεναρίων προς εξαγωγή.
         sheet_naming: Pattern ονοματοδοσίας φύλλων (π.χ. "ΣΕΝΑΡΙΟ_{id}").
+        workers: Διεργασίες για παράλληλη εκτέλεση των σεναρίων (1 = σειριακά).
     """
     in_path = Path(step1_workbook_path)
     if not in_path.exists():
@@ -46,6 +48,7 @@ def main(
         seed=seed,
         max_results=max_results,
         sheet_naming=sheet_naming,
+        workers=workers,
     )
     print(f"OK: Δημιουργήθηκε το {out_path.name}")
 
@@ -84,6 +87,12 @@ if __name__ == "__main__":
         default="ΣΕΝΑΡΙΟ_{id}",
         help='Pattern ονοματοδοσίας φύλλων (default: "ΣΕΝΑΡΙΟ_{id}").',
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Διεργασίες για παράλληλη εκτέλεση των σεναρίων (default: 1).",
+    )
 
     args = parser.parse_args()
     main(
@@ -92,4 +101,5 @@ if __name__ == "__main__":
         seed=args.seed,
         max_results=args["max_results"] if isinstance(args, dict) else args.max_results,
         sheet_naming=args.sheet_naming,
+        workers=args.workers,
     )
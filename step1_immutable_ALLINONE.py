@@ -5,6 +5,7 @@ step1_immutable_ALLINONE.py
 ΕΝΑ αρχείο που:
   • Περιέχει όλο τον κώδικα του Βήματος 1 (όπως στο step1_immutable.py σου)
   • Περιέχει exporter που βγάζει ΜΟΝΟ τα φύλλα ΒΗΜΑ1_ΣΕΝΑΡΙΟ_k (χωρίς σύνοψη/master)
+  • Περιέχει columnar exporter (--layout columnar): βάση μία φορά + φύλλο σεναρίων
   • Παρέχει CLI: 
       python step1_immutable_ALLINONE.py -i "Παραδειγμα τελικη μορφηΤΜΗΜΑ.xlsx" -o "STEP1_IMMUTABLE_MULTISHEET_NODUP.xlsx"
 """
@@ -20,34 +21,156 @@ from pathlib import Path
 είναι ΟΡΙΣΤΙΚΕΣ και δεν αλλάζουν ποτέ στα επόμενα βήματα.
 """
 
-from dataclasses import dataclass, field
-from typing import Dict, List, Set, Tuple, Optional, FrozenSet
+from array import array
+from collections.abc import Mapping
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Set, Tuple, Optional, FrozenSet
 import pandas as pd
 import numpy as np
-import itertools
+import hashlib
+import heapq
+import json
 import math
+import os
+import random
 import re
 import ast
+import time
 from pathlib import Path
 
+# Πάνω από αυτό το πλήθος canonical ισόρροπων κατανομών, η ακριβής αναζήτηση
+# αντικαθίσταται από seeded δειγματοληψία/τοπική αναζήτηση με χρονικό όριο.
+MAX_EXACT_SEARCH_SPACE = 5_000_000
+DEFAULT_TIME_BUDGET_S = 10.0
+RANDOM_SEED = 42
+
+YES_TOKENS = {"Ν", "ΝΑΙ", "YES", "TRUE", "1", "Y"}
+
+# Cache αποτελεσμάτων (opt-in): αλλαγή έκδοσης ακυρώνει όλες τις παλιές εγγραφές
+STEP1_CACHE_VERSION = 1
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Επισκευή (update_step1): πάνω από τόσα παιδιά που προστέθηκαν/αφαιρέθηκαν -> πλήρης παραγωγή
+MAX_REPAIR_CHANGES = 3
+
+# Columnar export: βάση μία φορά + ένα φύλλο με μία στήλη ανά σενάριο
+COLUMNAR_BASE_SHEET = "ΒΑΣΗ"
+COLUMNAR_SCENARIOS_SHEET = "ΒΗΜΑ1_ΣΕΝΑΡΙΑ"
+
+
+def assignment_fingerprint(assignments) -> str:
+    """Σταθερό hash περιεχομένου για ζεύγη (όνομα, τμήμα), ανεξάρτητο από τη σειρά."""
+    h = hashlib.sha256()
+    for name, cls in sorted(assignments):
+        h.update(f"{name}\t{cls}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+class _AssignmentsView(Mapping):
+    """Read-only προβολή όνομα -> τμήμα πάνω στον συμπαγή πίνακα κωδικών ενός σεναρίου."""
+    __slots__ = ("_scenario",)
+
+    def __init__(self, scenario: "Step1Scenario"):
+        self._scenario = scenario
+
+    def __getitem__(self, name: str) -> str:
+        value = self._scenario.get_assignment(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __iter__(self):
+        sc = self._scenario
+        return (name for name, code in zip(sc.teacher_kids, sc.codes) if code)
+
+    def __len__(self) -> int:
+        codes = self._scenario.codes
+        return len(codes) - codes.count(0)
+
+    def items(self):
+        sc = self._scenario
+        return ((name, sc.class_labels[code - 1]) for name, code in zip(sc.teacher_kids, sc.codes) if code)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
 
 @dataclass(frozen=True)
 class Step1Scenario:
-    """Immutable σενάριο βήματος 1"""
+    """
+    Immutable σενάριο βήματος 1.
+
+    Οι αναθέσεις κρατιούνται ως bytes, ένα byte ανά μαθητή του κοινού teacher_kids tuple:
+    δείκτης τμήματος + 1 (0 = χωρίς ανάθεση)· το assignments είναι lazy προβολή. Ο κατασκευαστής
+    δέχεται κωδικούς -1/δείκτη (π.χ. το array της αναζήτησης) και τους κωδικοποιεί, ώστε το
+    σενάριο να είναι συμπαγές και πραγματικά αμετάβλητο. name_index: κοινό ευρετήριο όνομα -> θέση για όλα τα
+    σενάρια του ίδιου teacher_kids (αλλιώς χτίζεται ανά σενάριο).
+    """
     id: int
     column_name: str  # "ΒΗΜΑ1_ΣΕΝΑΡΙΟ_1"
-    assignments: Dict[str, str]  # name -> class
+    teacher_kids: Tuple[str, ...]  # κοινό για όλα τα σενάρια
+    class_labels: Tuple[str, ...]  # ("Α1", "Α2", ...)
+    codes: bytes  # codes[i] = δείκτης τμήματος του teacher_kids[i] + 1 (0 = χωρίς ανάθεση)
     description: str
     broken_friendships: int
     metadata: Dict[str, any] = field(default_factory=dict)
-    
+    name_index: Optional[Dict[str, int]] = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        if not isinstance(self.codes, bytes):
+            if len(self.class_labels) > 254:
+                raise ValueError("Step1Scenario: έως 254 τμήματα ανά σενάριο")
+            object.__setattr__(self, "codes", bytes(c + 1 for c in self.codes))
+        if self.name_index is None:
+            object.__setattr__(self, "name_index", name_index_for(self.teacher_kids))
+
+    @classmethod
+    def from_assignments(cls, id: int, column_name: str, assignments: Dict[str, str],
+                         description: str, broken_friendships: int,
+                         metadata: Optional[Dict[str, any]] = None,
+                         teacher_kids: Optional[Tuple[str, ...]] = None,
+                         class_labels: Optional[Tuple[str, ...]] = None,
+                         name_index: Optional[Dict[str, int]] = None) -> "Step1Scenario":
+        """Κατασκευή από dict όνομα -> τμήμα (συμβατότητα με την παλιά μορφή)."""
+        names = tuple(assignments) if teacher_kids is None else tuple(teacher_kids)
+        if class_labels is None:
+            class_labels = tuple(sorted(set(assignments.values()),
+                                        key=lambda c: (len(c), c)))
+        label_index = {label: k for k, label in enumerate(class_labels)}
+        codes = tuple(label_index[assignments[n]] if n in assignments else -1 for n in names)
+        return cls(id=id, column_name=column_name, teacher_kids=names,
+                   class_labels=tuple(class_labels), codes=codes, description=description,
+                   broken_friendships=broken_friendships, metadata=dict(metadata or {}),
+                   name_index=name_index)
+
+    @property
+    def assignments(self) -> Mapping:
+        """Read-only προβολή όνομα -> τμήμα"""
+        return _AssignmentsView(self)
+
     def get_assignment(self, student_name: str) -> Optional[str]:
         """Read-only πρόσβαση σε ανάθεση"""
-        return self.assignments.get(student_name)
+        pos = self.name_index.get(student_name)
+        if pos is None or not self.codes[pos]:
+            return None
+        return self.class_labels[self.codes[pos] - 1]
     
     def get_students_in_class(self, class_name: str) -> List[str]:
         """Επιστρέφει λίστα μαθητών σε τμήμα"""
-        return [name for name, cls in self.assignments.items() if cls == class_name]
+        try:
+            code = self.class_labels.index(class_name) + 1
+        except ValueError:
+            return []
+        return [name for name, c in zip(self.teacher_kids, self.codes) if c == code]
+
+
+def _code_typecode(num_classes: int) -> str:
+    return "b" if num_classes < 128 else "h"
+
+
+def name_index_for(names: Tuple[str, ...]) -> Dict[str, int]:
+    """Ευρετήριο όνομα -> θέση· χτίζεται μία φορά ανά teacher_kids και περνά σε κάθε σενάριο."""
+    return {name: i for i, name in enumerate(names)}
 
 
 @dataclass(frozen=True)
@@ -58,6 +181,8 @@ class Step1Results:
     teacher_kids: Tuple[str, ...]
     num_classes: int
     creation_timestamp: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    fingerprints: Dict[str, str] = field(default_factory=dict)  # column_name -> hash
     
     def get_scenario(self, scenario_id: int) -> Optional[Step1Scenario]:
         """Επιστρέφει σενάριο με βάση ID"""
@@ -73,37 +198,198 @@ class Step1Results:
                 return scenario
         return None
     
+    def matches_fingerprint(self, df: pd.DataFrame, column_name: str,
+                            first_rows: Optional[pd.DataFrame] = None) -> bool:
+        """
+        O(N) έλεγχος: το hash των (όνομα, τιμή) της στήλης για τα παιδιά του σεναρίου
+        ισούται με το αποθηκευμένο fingerprint. False αν δεν υπάρχει fingerprint.
+        """
+        expected = self.fingerprints.get(column_name)
+        scenario = self.get_scenario_by_column(column_name)
+        if expected is None or scenario is None or column_name not in df.columns:
+            return False
+        if first_rows is None:
+            first_rows = df.drop_duplicates(subset="ΟΝΟΜΑ")
+        sub = first_rows.loc[first_rows["ΟΝΟΜΑ"].isin(list(scenario.assignments)), ["ΟΝΟΜΑ", column_name]]
+        sub = sub[sub[column_name].notna()]
+        values = sub[column_name].map(lambda v: str(v).strip())
+        return assignment_fingerprint(zip(sub["ΟΝΟΜΑ"], values)) == expected
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-συμβατή αναπαράσταση (για cache/αποθήκευση)."""
+        return {
+            "scenarios": [
+                {
+                    "id": sc.id,
+                    "column_name": sc.column_name,
+                    "assignments": dict(sc.assignments.items()),
+                    "description": sc.description,
+                    "broken_friendships": sc.broken_friendships,
+                    "metadata": dict(sc.metadata),
+                }
+                for sc in self.scenarios
+            ],
+            "friendships": sorted(list(pair) for pair in self.friendships),
+            "teacher_kids": list(self.teacher_kids),
+            "num_classes": self.num_classes,
+            "creation_timestamp": self.creation_timestamp,
+            "metadata": dict(self.metadata),
+            "fingerprints": dict(self.fingerprints),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Step1Results":
+        """Αντίστροφο του to_dict."""
+        teacher_kids = tuple(data["teacher_kids"])
+        class_labels = tuple(f"Α{i+1}" for i in range(int(data["num_classes"])))
+        name_index = name_index_for(teacher_kids)
+        return cls(
+            scenarios=tuple(
+                Step1Scenario.from_assignments(teacher_kids=teacher_kids, class_labels=class_labels,
+                                               name_index=name_index, **sc)
+                for sc in data["scenarios"]
+            ),
+            friendships=frozenset(tuple(pair) for pair in data["friendships"]),
+            teacher_kids=teacher_kids,
+            num_classes=int(data["num_classes"]),
+            creation_timestamp=data["creation_timestamp"],
+            metadata=dict(data.get("metadata", {})),
+            fingerprints=dict(data.get("fingerprints", {})),
+        )
+
     def validate_immutability(self, df: pd.DataFrame) -> bool:
         """Ελέγχει ότι οι στήλες ΒΗΜΑ1_ΣΕΝΑΡΙΟ_X δεν έχουν αλλάξει"""
+        # Ένα ευρετήριο όνομα -> πρώτη γραμμή για όλα τα σενάρια
+        first_rows = df.drop_duplicates(subset="ΟΝΟΜΑ", keep="first")
+        by_name = first_rows.set_index("ΟΝΟΜΑ")
         for scenario in self.scenarios:
             col_name = scenario.column_name
             if col_name not in df.columns:
                 raise ValueError(f"Λείπει στήλη {col_name} - παραβίαση immutability")
             
+            # Fast path: ίδιο fingerprint περιεχομένου
+            if self.matches_fingerprint(df, col_name, first_rows=first_rows):
+                continue
+            
             # Έλεγχος ότι οι αναθέσεις είναι οι αναμενόμενες
-            for student_name, expected_class in scenario.assignments.items():
-                student_row = df[df["ΟΝΟΜΑ"] == student_name]
-                if student_row.empty:
-                    continue
-                
-                actual_class = student_row[col_name].iloc[0]
-                if pd.notna(actual_class) and str(actual_class).strip() != expected_class:
-                    raise ValueError(
-                        f"ΠΑΡΑΒΙΑΣΗ IMMUTABILITY: {student_name} σε {col_name} "
-                        f"αναμενόταν '{expected_class}', βρέθηκε '{actual_class}'"
-                    )
+            expected = pd.Series(dict(scenario.assignments.items()), dtype=object)
+            actual = by_name[col_name].reindex(expected.index)
+            mismatch = actual.notna() & (actual.map(lambda v: str(v).strip()) != expected)
+            if mismatch.any():
+                student_name = mismatch.idxmax()
+                raise ValueError(
+                    f"ΠΑΡΑΒΙΑΣΗ IMMUTABILITY: {student_name} σε {col_name} "
+                    f"αναμενόταν '{expected[student_name]}', βρέθηκε '{actual[student_name]}'"
+                )
         return True
 
 
+class Step1Cache:
+    """
+    Τοπικό cache αποτελεσμάτων Βήματος 1 (ένα JSON αρχείο ανά κλειδί).
+
+    Κλειδί = hash των εισόδων που επηρεάζουν πραγματικά το αποτέλεσμα: κανονικοποιημένα
+    ονόματα παιδιών εκπαιδευτικών (με τη σειρά τους), αμοιβαίες φιλίες, num_classes και
+    ρυθμίσεις αναζήτησης. Όταν το μέγεθος ξεπεράσει το max_bytes, σβήνονται πρώτα οι
+    εγγραφές που χρησιμοποιήθηκαν λιγότερο πρόσφατα (LRU με βάση το mtime).
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(teacher_kids: List[str], friendships: FrozenSet[Tuple[str, str]],
+                 num_classes: int, options: Dict[str, Any]) -> str:
+        payload = {
+            "version": STEP1_CACHE_VERSION,
+            "teacher_kids": list(teacher_kids),
+            "friendships": sorted(list(pair) for pair in friendships),
+            "num_classes": num_classes,
+            "options": options,
+        }
+        raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"step1_{key}.json"
+
+    def get(self, key: str) -> Optional[Step1Results]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                results = Step1Results.from_dict(json.load(fh))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        try:
+            os.utime(path)  # ενημέρωση για LRU
+        except OSError:
+            pass
+        return results
+
+    def put(self, key: str, results: Step1Results) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(results.to_dict(), fh, ensure_ascii=False)
+        os.replace(tmp, path)
+        self._evict(keep=path)
+
+    def _evict(self, keep: Optional[Path] = None) -> None:
+        entries = []
+        for p in self.cache_dir.glob("step1_*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            if p == keep:
+                continue
+            try:
+                p.unlink()
+                total -= size
+            except OSError:
+                pass
+
+
 class Step1ImmutableProcessor:
     """Επεξεργαστής που εξασφαλίζει immutability του Βήματος 1"""
     
     def __init__(self):
         self._results: Optional[Step1Results] = None
         self._is_locked: bool = False
+        self._search_info: Dict[str, Any] = {}
     
-    def create_scenarios(self, df: pd.DataFrame, num_classes: Optional[int] = None) -> Step1Results:
-        """Δημιουργία immutable σεναρίων"""
+    def create_scenarios(self, df: pd.DataFrame, num_classes: Optional[int] = None,
+                         search: str = "bnb", contract_friends: bool = False,
+                         time_budget: Optional[float] = None,
+                         max_exact_space: int = MAX_EXACT_SEARCH_SPACE,
+                         seed: int = RANDOM_SEED,
+                         workers: int = 1,
+                         cache_dir: Optional[str] = None,
+                         cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES) -> Step1Results:
+        """
+        Δημιουργία immutable σεναρίων.
+
+        search: "bnb" (branch-and-bound top-5, default), "exhaustive" (όλα τα σενάρια
+        υλοποιούνται και φιλτράρονται στο τέλος) ή "sample" (πάντα δειγματοληψία).
+        Τα "bnb"/"exhaustive" δίνουν τα ίδια 5 σενάρια.
+        contract_friends: αν True, αναζητά πρώτα σενάρια 0 σπασμένων φιλιών με κάθε
+        ομάδα φίλων ως ενιαίο στοιχείο· η πλήρης αναζήτηση τρέχει μόνο αν δεν βρεθεί κανένα.
+        time_budget / max_exact_space / seed: αν ο εκτιμώμενος χώρος αναζήτησης ξεπερνά
+        το max_exact_space, γίνεται seeded δειγματοληψία για έως time_budget δευτερόλεπτα.
+        Το metadata["search"] του αποτελέσματος γράφει "exact" ή "sampled".
+        workers: πλήθος διεργασιών για την παράλληλη branch-and-bound αναζήτηση (ίδιο αποτέλεσμα).
+        cache_dir: αν δοθεί, τα αποτελέσματα αποθηκεύονται/ανακτώνται από Step1Cache εκεί
+        (metadata["cache"] = "hit" ή "miss").
+        """
+        if search not in ("bnb", "exhaustive", "sample"):
+            raise ValueError(f"Άγνωστη μέθοδος αναζήτησης: {search}")
         if self._is_locked:
             raise RuntimeError("Step1 είναι ήδη κλειδωμένο - δεν επιτρέπονται αλλαγές")
         
@@ -133,8 +419,32 @@ class Step1ImmutableProcessor:
         # Εξαγωγή φιλιών
         friendships = self._extract_friendships(df_norm, teacher_kids)
         
+        # Cache: ίδια παιδιά/φιλίες/τμήματα/ρυθμίσεις -> ίδια σενάρια
+        cache = cache_key = None
+        if cache_dir:
+            cache = Step1Cache(cache_dir, max_bytes=cache_max_bytes)
+            cache_key = Step1Cache.make_key(teacher_kids, friendships, num_classes, {
+                "search": "sample" if search == "sample" else "exact",
+                "contract_friends": contract_friends,
+                "max_exact_space": max_exact_space,
+                "seed": seed,
+                "time_budget": time_budget,
+            })
+            cached = cache.get(cache_key)
+            if cached is not None:
+                print(f"Cache hit ({cache_key[:12]}) - παράλειψη αναζήτησης")
+                self._results = replace(
+                    cached, metadata={**cached.metadata, "cache": "hit", "cache_key": cache_key}
+                )
+                return self._results
+        
         # Δημιουργία σεναρίων
-        scenarios = self._generate_scenarios(teacher_kids, num_classes, friendships)
+        scenarios = self._generate_scenarios(teacher_kids, num_classes, friendships,
+                                             search=search, contract_friends=contract_friends,
+                                             time_budget=time_budget,
+                                             max_exact_space=max_exact_space, seed=seed,
+                                             workers=workers,
+                                             name_index=name_index_for(tuple(teacher_kids)))
         
         # Δημιουργία immutable αποτελεσμάτων
         self._results = Step1Results(
@@ -142,12 +452,231 @@ class Step1ImmutableProcessor:
             friendships=friendships,
             teacher_kids=tuple(teacher_kids),
             num_classes=num_classes,
-            creation_timestamp=pd.Timestamp.now().isoformat()
+            creation_timestamp=pd.Timestamp.now().isoformat(),
+            metadata={
+                **self._search_info,
+                # ρυθμίσεις αναζήτησης, για ίδια πλήρη παραγωγή σε fallback του update_scenarios
+                "options": {
+                    "search": search,
+                    "contract_friends": contract_friends,
+                    "time_budget": time_budget,
+                    "max_exact_space": max_exact_space,
+                    "seed": seed,
+                },
+            },
+            fingerprints={
+                sc.column_name: assignment_fingerprint(sc.assignments.items()) for sc in scenarios
+            }
         )
+        if cache is not None:
+            cache.put(cache_key, self._results)
+            self._results = replace(
+                self._results, metadata={**self._results.metadata, "cache": "miss", "cache_key": cache_key}
+            )
         
         print(f"Δημιουργήθηκαν {len(scenarios)} immutable σενάρια")
         return self._results
     
+    def update_scenarios(self, previous: Step1Results, df: pd.DataFrame,
+                         max_changes: int = MAX_REPAIR_CHANGES,
+                         search: Optional[str] = None,
+                         time_budget: Optional[float] = None,
+                         workers: int = 1,
+                         contract_friends: Optional[bool] = None,
+                         max_exact_space: Optional[int] = None,
+                         seed: Optional[int] = None,
+                         cache_dir: Optional[str] = None) -> Step1Results:
+        """
+        Τοπική επισκευή προηγούμενων σεναρίων όταν αλλάζουν λίγο τα παιδιά εκπαιδευτικών.
+
+        Κάθε παλιό σενάριο κρατά τις αναθέσεις όσων παραμένουν· όσοι αφαιρέθηκαν
+        βγαίνουν, κάθε νέο παιδί μπαίνει στο τμήμα (με χώρο) με τους περισσότερους
+        φίλους του και, αν τα μεγέθη απέχουν >1, μετακινούνται παιδιά από τα μεγαλύτερα
+        στα μικρότερα τμήματα με το μικρότερο κόστος σε φιλίες. Τα επισκευασμένα σενάρια
+        περνούν την ίδια επιλογή με την πλήρη παραγωγή (μόνο 0 σπασμένες αν υπάρχουν,
+        αλλιώς ταξινόμηση κατά σπασμένες, έως 5) και αριθμούνται από την αρχή.
+        Πλήρης παραγωγή (create_scenarios) γίνεται μόνο αν: άλλαξαν περισσότερα από
+        max_changes παιδιά, ισχύει πλέον ο Κανόνας 1, ή η ισορροπία δεν αποκαθίσταται.
+        search/time_budget/contract_friends/max_exact_space/seed: None = ό,τι χρησιμοποίησε
+        η αρχική παραγωγή (previous.metadata["options"]), ώστε το fallback να είναι η ίδια αναζήτηση.
+        """
+        if self._is_locked:
+            raise RuntimeError("Step1 είναι ήδη κλειδωμένο - δεν επιτρέπονται αλλαγές")
+
+        df_norm = self._normalize_dataframe(df)
+        num_classes = previous.num_classes
+        teacher_kids = self._get_teacher_kids(df_norm)
+        friendships = self._extract_friendships(df_norm, teacher_kids) if teacher_kids else frozenset()
+
+        old_set, new_set = set(previous.teacher_kids), set(teacher_kids)
+        added = [name for name in teacher_kids if name not in old_set]
+        removed = [name for name in previous.teacher_kids if name not in new_set]
+        print(f"Ενημέρωση Βήματος 1: +{len(added)} / -{len(removed)} παιδιά εκπαιδευτικών")
+
+        options = previous.metadata.get("options", {})
+        search = options.get("search", "bnb") if search is None else search
+        contract_friends = options.get("contract_friends", False) if contract_friends is None else contract_friends
+        max_exact_space = options.get("max_exact_space", MAX_EXACT_SEARCH_SPACE) if max_exact_space is None else max_exact_space
+        seed = options.get("seed", previous.metadata.get("seed", RANDOM_SEED)) if seed is None else seed
+        if time_budget is None:
+            time_budget = options.get("time_budget", previous.metadata.get("time_budget"))
+
+        def full_generation(reason: str) -> Step1Results:
+            print(f"{reason} - πλήρης παραγωγή σεναρίων")
+            results = self.create_scenarios(df, num_classes, search=search,
+                                            contract_friends=contract_friends,
+                                            time_budget=time_budget,
+                                            max_exact_space=max_exact_space, seed=seed,
+                                            workers=workers, cache_dir=cache_dir)
+            self._results = replace(results, metadata={**results.metadata, "repair": "fallback"})
+            return self._results
+
+        if not previous.scenarios or not teacher_kids:
+            return full_generation("Δεν υπάρχουν σενάρια προς επισκευή")
+        if len(added) + len(removed) > max_changes:
+            return full_generation(f"Αλλαγές {len(added) + len(removed)} > {max_changes}")
+        if len(teacher_kids) <= num_classes or len(previous.teacher_kids) <= num_classes:
+            return full_generation("Κανόνας 1 (≤1 ανά τμήμα)")
+
+        kids = tuple(teacher_kids)
+        index = {name: i for i, name in enumerate(kids)}
+        adj: List[List[int]] = [[] for _ in kids]
+        for a, b in friendships:
+            ia, ib = index.get(a), index.get(b)
+            if ia is None or ib is None or ia == ib:
+                continue
+            adj[ia].append(ib)
+            adj[ib].append(ia)
+
+        # Γειτονιά της αλλαγής: νέα παιδιά + όσοι άλλαξαν φίλους (π.χ. φίλοι αφαιρεθέντων)
+        old_friends: Dict[str, Set[str]] = {}
+        for a, b in previous.friendships:
+            old_friends.setdefault(a, set()).add(b)
+            old_friends.setdefault(b, set()).add(a)
+        affected = {index[name] for name in added}
+        affected.update(
+            i for i, name in enumerate(kids)
+            if {kids[u] for u in adj[i]} != old_friends.get(name, set())
+        )
+
+        repaired: List[Tuple[array, int, Step1Scenario]] = []
+        seen: Set[Tuple[int, ...]] = set()
+        for old in previous.scenarios:
+            codes = self._repair_codes(old, kids, index, adj, num_classes, affected)
+            if codes is None:
+                return full_generation(f"{old.column_name}: αδύνατη αποκατάσταση ισορροπίας")
+            relabel: Dict[int, int] = {}
+            key = tuple(relabel.setdefault(c, len(relabel)) for c in codes)
+            if key in seen:
+                continue
+            seen.add(key)
+            broken = sum(1 for i in range(len(kids)) for u in adj[i] if u > i and codes[u] != codes[i])
+            repaired.append((codes, broken, old))
+
+        # Ίδιοι κανόνες επιλογής με την πλήρη παραγωγή: 0 σπασμένες αν υπάρχουν, αλλιώς ταξινόμηση
+        without_breaks = [item for item in repaired if item[1] == 0]
+        repaired = without_breaks if without_breaks else sorted(repaired, key=lambda item: item[1])
+
+        scenarios: List[Step1Scenario] = []
+        for sid, (codes, broken, old) in enumerate(repaired[:5], 1):
+            scenarios.append(Step1Scenario(
+                id=sid,
+                column_name=f"ΒΗΜΑ1_ΣΕΝΑΡΙΟ_{sid}",
+                teacher_kids=kids,
+                class_labels=old.class_labels,
+                codes=codes,
+                description=f"{old.description} (επισκευή)",
+                broken_friendships=broken,
+                metadata={**old.metadata, "repaired_from": old.column_name},
+                name_index=index
+            ))
+
+        self._results = Step1Results(
+            scenarios=tuple(scenarios),
+            friendships=friendships,
+            teacher_kids=kids,
+            num_classes=num_classes,
+            creation_timestamp=pd.Timestamp.now().isoformat(),
+            metadata={
+                **{k: v for k, v in previous.metadata.items() if k not in ("cache", "cache_key")},
+                "repair": "local",
+                "repaired_from": previous.creation_timestamp,
+                "added": added,
+                "removed": removed,
+            },
+            fingerprints={
+                sc.column_name: assignment_fingerprint(sc.assignments.items()) for sc in scenarios
+            }
+        )
+        print(f"Επισκευάστηκαν {len(scenarios)} immutable σενάρια")
+        return self._results
+
+    def _repair_codes(self, old: Step1Scenario, kids: Tuple[str, ...], index: Dict[str, int],
+                      adj: List[List[int]], num_classes: int, affected: Set[int]) -> Optional[array]:
+        """
+        Αναθέσεις του old πάνω στα νέα kids: τοποθέτηση νέων, επαναφορά ισορροπίας και
+        ανταλλαγές (που κρατούν τα μεγέθη) μόνο για παιδιά της γειτονιάς affected.
+        """
+        n = len(kids)
+        cap = -(-n // num_classes)
+        codes = array(_code_typecode(num_classes), [-1]) * n
+        counts = [0] * num_classes
+        for name, cls in old.assignments.items():
+            i = index.get(name)
+            if i is not None:
+                codes[i] = old.class_labels.index(cls)
+                counts[codes[i]] += 1
+
+        def friends_in(i: int, c: int) -> int:
+            return sum(1 for u in adj[i] if codes[u] == c)
+
+        # Νέα παιδιά: τμήμα με χώρο και τους περισσότερους φίλους (ισοπαλία: μικρότερο)
+        for i in range(n):
+            if codes[i] >= 0:
+                continue
+            room = [c for c in range(num_classes) if counts[c] < cap]
+            c = min(room, key=lambda c: (-friends_in(i, c), counts[c], c))
+            codes[i] = c
+            counts[c] += 1
+
+        # Επαναφορά ισορροπίας: μετακινήσεις μεγαλύτερο -> μικρότερο τμήμα
+        for _ in range(n):
+            if max(counts) - min(counts) <= 1:
+                break
+            dst = counts.index(min(counts))
+            big = max(counts)
+            moves = [
+                (friends_in(i, codes[i]) - friends_in(i, dst), i)
+                for i in range(n) if counts[codes[i]] == big
+            ]
+            _, i = min(moves)
+            counts[codes[i]] -= 1
+            codes[i] = dst
+            counts[dst] += 1
+            affected = affected | {i}
+
+        def local(i: int) -> int:
+            return sum(1 for u in adj[i] if codes[u] != codes[i])
+
+        # Τοπική βελτίωση: ανταλλαγές που μειώνουν τις σπασμένες φιλίες
+        improved = True
+        while improved:
+            improved = False
+            for a in sorted(affected):
+                for b in range(n):
+                    if codes[a] == codes[b]:
+                        continue
+                    before = local(a) + local(b)
+                    codes[a], codes[b] = codes[b], codes[a]
+                    if local(a) + local(b) < before:
+                        improved = True
+                    else:
+                        codes[a], codes[b] = codes[b], codes[a]
+
+        if max(counts) - min(counts) > 1 or len(set(codes)) == 1:
+            return None
+        return codes
+
     def apply_to_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
         """Εφαρμόζει τα σενάρια στο DataFrame ΚΑΙ το κλειδώνει"""
         if not self._results:
@@ -155,16 +684,10 @@ class Step1ImmutableProcessor:
         
         result_df = df.copy()
         
-        # Προσθήκη στηλών ΒΗΜΑ1_ΣΕΝΑΡΙΟ_X
+        # Προσθήκη στηλών ΒΗΜΑ1_ΣΕΝΑΡΙΟ_X: κενό για όλους, τμήμα μόνο για παιδιά εκπαιδευτικών
         for scenario in self._results.scenarios:
             col_name = scenario.column_name
-            result_df[col_name] = ""  # Αρχικοποίηση με κενές τιμές
-            
-            # Συμπλήρωση μόνο για παιδιά εκπαιδευτικών
-            for student_name, class_assigned in scenario.assignments.items():
-                mask = result_df["ΟΝΟΜΑ"] == student_name
-                if mask.any():
-                    result_df.loc[mask, col_name] = class_assigned
+            result_df[col_name] = result_df["ΟΝΟΜΑ"].map(dict(scenario.assignments.items())).fillna("")
         
         # ΚΛΕΙΔΩΜΑ - μετά από αυτό δεν επιτρέπονται αλλαγές
         self._is_locked = True
@@ -228,7 +751,7 @@ class Step1ImmutableProcessor:
     def _norm_yesno(self, val) -> str:
         """Κανονικοποίηση Ν/Ο τιμών"""
         s = str(val).strip().upper()
-        return "Ν" if s in {"Ν", "ΝΑΙ", "YES", "TRUE", "1", "Y"} else "Ο"
+        return "Ν" if s in YES_TOKENS else "Ο"
     
     def _get_teacher_kids(self, df: pd.DataFrame) -> List[str]:
         """Εντοπισμός παιδιών εκπαιδευτικών"""
@@ -251,24 +774,13 @@ class Step1ImmutableProcessor:
         """Εξαγωγή αμοιβαίων φιλιών μεταξύ παιδιών εκπαιδευτικών"""
         teacher_kids_set = set(teacher_kids)
         student_friends = {}
+        friendships = set()
         
         # ΜΕΘΟΔΟΣ 1: Matrix-style (στήλες με ονόματα)
         friendship_cols = self._find_friendship_columns(df)
         if friendship_cols:
             print(f"Εντοπίστηκαν {len(friendship_cols)} στήλες φιλιών (matrix-style)")
-            
-            for col in friendship_cols:
-                friend_name = str(col).strip()
-                if friend_name in teacher_kids_set:
-                    # Βρες ποια παιδιά εκπαιδευτικών έχουν γράψει το friend_name ως φίλο
-                    friend_mask = (df["ΟΝΟΜΑ"].isin(teacher_kids)) & (df[col].map(self._norm_yesno) == "Ν")
-                    students_who_wrote_this_friend = df[friend_mask]["ΟΝΟΜΑ"].tolist()
-                    
-                    for student in students_who_wrote_this_friend:
-                        if student != friend_name:  # Όχι φιλία με τον εαυτό του
-                            if student not in student_friends:
-                                student_friends[student] = set()
-                            student_friends[student].add(friend_name)
+            friendships |= self._matrix_friendships(df, teacher_kids, friendship_cols)
         
         # ΜΕΘΟΔΟΣ 2: Single-column ΦΙΛΟΙ (fallback)
         elif "ΦΙΛΟΙ" in df.columns:
@@ -298,7 +810,6 @@ class Step1ImmutableProcessor:
             print("Δεν βρέθηκαν στήλες φιλιών")
         
         # Έλεγχος αμοιβαιότητας: A→B ΚΑΙ B→A
-        friendships = set()
         for student_a in student_friends:
             friends_of_a = student_friends[student_a]
             for student_b in friends_of_a:
@@ -310,102 +821,353 @@ class Step1ImmutableProcessor:
         print(f"Βρέθηκαν {len(friendships)} αμοιβαίες φιλίες μεταξύ παιδιών εκπαιδευτικών")
         return frozenset(friendships)
     
-    def _count_broken_friendships(self, teacher_kids: List[str], assign_map: Dict[str, str], 
-                               friendships: FrozenSet[Tuple[str, str]]) -> int:
-        """Μέτρηση σπασμένων φιλιών σε ένα σενάριο κατανομής"""
-        broken = 0
-        for friend1, friend2 in friendships:
-            if assign_map.get(friend1) != assign_map.get(friend2):
-                broken += 1
-        return broken
-    
-    def _canonical_key(self, names: List[str], assign_map: Dict[str, str], class_labels_list: List[str]) -> Tuple:
-        """Canonical key για αποφυγή duplicates"""
-        buckets = []
-        for c in class_labels_list:
-            members = tuple(sorted([n for n in names if assign_map.get(n) == c]))
-            buckets.append(members)
-        return tuple(sorted(buckets))
-    
+    def _matrix_friendships(self, df: pd.DataFrame, teacher_kids: List[str],
+                            friendship_cols: List[str]) -> Set[Tuple[str, str]]:
+        """
+        Αμοιβαίες φιλίες από matrix-style στήλες, vectorized.
+
+        Το μπλοκ [γραμμές παιδιών εκπαιδευτικών × στήλες με ονόματα παιδιών εκπαιδευτικών]
+        κανονικοποιείται μία φορά σε boolean πίνακα γειτνίασης A (A[i, j]: ο i έγραψε τον j)
+        και οι αμοιβαίες φιλίες είναι τα True του A & A.T.
+        """
+        kid_index: Dict[str, int] = {}
+        for name in teacher_kids:
+            kid_index.setdefault(name, len(kid_index))
+        kid_names = list(kid_index)
+
+        wanted = set(friendship_cols)
+        col_pos, col_kid = [], []
+        for pos, col in enumerate(df.columns):
+            friend_name = str(col).strip()
+            if col in wanted and friend_name in kid_index:
+                col_pos.append(pos)
+                col_kid.append(kid_index[friend_name])
+        names = df["ΟΝΟΜΑ"].astype(str).to_numpy(dtype=object)
+        row_pos = [i for i, name in enumerate(names) if name in kid_index]
+        if not col_pos or not row_pos:
+            return set()
+
+        block = df.iloc[row_pos, col_pos].to_numpy(dtype=object).astype(str)
+        yes = np.isin(np.char.upper(np.char.strip(block)), list(YES_TOKENS))
+
+        size = len(kid_names)
+        adj = np.zeros((size, size), dtype=bool)
+        row_kid = np.array([kid_index[names[i]] for i in row_pos])
+        rr, cc = np.nonzero(yes)
+        adj[row_kid[rr], np.asarray(col_kid)[cc]] = True
+        np.fill_diagonal(adj, False)  # Όχι φιλία με τον εαυτό του
+
+        mutual = np.triu(adj & adj.T, k=1)
+        return {tuple(sorted((kid_names[i], kid_names[j]))) for i, j in zip(*np.nonzero(mutual))}
+
+    def _balanced_partitions(self, n: int, num_classes: int, weights: Optional[List[int]] = None,
+                             depth: Optional[int] = None):
+        """
+        Παράγει ΜΟΝΟ canonical & ισόρροπες κατανομές n στοιχείων σε num_classes τμήματα.
+
+        Κάθε κατανομή επιστρέφεται ως tuple δεικτών τμήματος (restricted growth string):
+        το στοιχείο i μπαίνει σε ήδη ανοιγμένο τμήμα ή στο ΕΠΟΜΕΝΟ νέο. Έτσι κάθε διαμέριση
+        εμφανίζεται μία φορά, με την ίδια σειρά και ετικέτες που θα έδινε η πρώτη εμφάνισή
+        της στο itertools.product. Κλάδοι που δεν μπορούν να καταλήξουν σε μεγέθη
+        q ή q+1 (q = μαθητές // num_classes) κόβονται αμέσως.
+
+        weights: πλήθος μαθητών ανά στοιχείο (π.χ. συγχωνευμένες ομάδες φίλων)·
+        η ισορροπία ελέγχεται πάντα σε μαθητές. None = 1 μαθητής ανά στοιχείο.
+        depth: αν δοθεί, επιστρέφει μόνο τα εφικτά προθέματα μήκους depth (για sharding).
+        """
+        w = weights if weights is not None else [1] * n
+        total = sum(w)
+        q, r = divmod(total, num_classes)
+        cap = q + (1 if r > 0 else 0)
+        counts = [0] * num_classes
+        codes = [0] * n
+        suffix = [0] * (n + 1)
+        for i in range(n - 1, -1, -1):
+            suffix[i] = suffix[i + 1] + w[i]
+
+        def feasible(remaining: int) -> bool:
+            need = sum(q - c for c in counts if c < q)
+            room = sum(cap - c for c in counts)
+            return need <= remaining <= room
+
+        stop = n if depth is None else depth
+
+        def rec(i: int, opened: int):
+            if i == stop:
+                if depth is not None:
+                    yield tuple(codes[:stop])
+                elif weights is None or min(counts) >= q:
+                    yield tuple(codes)
+                return
+            for c in range(min(opened + 1, num_classes)):
+                if counts[c] + w[i] > cap:
+                    continue
+                counts[c] += w[i]
+                if feasible(suffix[i + 1]):
+                    codes[i] = c
+                    yield from rec(i + 1, max(opened, c + 1))
+                counts[c] -= w[i]
+
+        yield from rec(0, 0)
+
+    def _friend_components(self, teacher_kids: List[str],
+                           friendships: FrozenSet[Tuple[str, str]]) -> List[List[int]]:
+        """
+        Συνεκτικές συνιστώσες του γράφου αμοιβαίων φιλιών (δείκτες στο teacher_kids),
+        ταξινομημένες με βάση το πρώτο τους μέλος.
+        """
+        parent = list(range(len(teacher_kids)))
+
+        def find(x: int) -> int:
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        index = {name: i for i, name in enumerate(teacher_kids)}
+        for a, b in friendships:
+            ia, ib = index.get(a), index.get(b)
+            if ia is None or ib is None:
+                continue
+            ra, rb = find(ia), find(ib)
+            if ra != rb:
+                parent[max(ra, rb)] = min(ra, rb)
+
+        groups: Dict[int, List[int]] = {}
+        for i in range(len(teacher_kids)):
+            groups.setdefault(find(i), []).append(i)
+        return sorted(groups.values(), key=lambda g: g[0])
+
+    def _contracted_generation(self, teacher_kids: List[str], num_classes: int,
+                               friendships: FrozenSet[Tuple[str, str]],
+                               top_k: int = 5) -> List[Tuple[array, int]]:
+        """
+        Σενάρια με 0 σπασμένες φιλίες, όπου κάθε ομάδα φίλων μετρά ως ένα στοιχείο
+        με βάρος το μέγεθός της.
+
+        Οι ομάδες διατάσσονται με το πρώτο τους μέλος, άρα η σειρά παραγωγής και οι
+        ετικέτες ταυτίζονται με τα σενάρια 0 σπασμένων φιλιών της πλήρους αναζήτησης.
+        Επιστρέφει κενή λίστα αν δεν υπάρχει ισόρροπη κατανομή χωρίς σπάσιμο ομάδας.
+        """
+        typecode = _code_typecode(num_classes)
+        components = self._friend_components(teacher_kids, friendships)
+        weights = [len(g) for g in components]
+        print(f"Συγχώνευση φίλων: {len(teacher_kids)} παιδιά → {len(components)} ομάδες")
+
+        valid_scenarios = []
+        for comp_codes in self._balanced_partitions(len(components), num_classes, weights):
+            if len(set(comp_codes)) == 1:
+                continue
+            codes = array(typecode, [0]) * len(teacher_kids)
+            for g, c in zip(components, comp_codes):
+                for i in g:
+                    codes[i] = c
+            valid_scenarios.append((codes, 0))
+            if len(valid_scenarios) == top_k:
+                break
+
+        print(f"Σενάρια χωρίς σπασμένες φιλίες (συγχώνευση): {len(valid_scenarios)}")
+        return valid_scenarios
+
     def _generate_scenarios(self, teacher_kids: List[str], num_classes: int, 
-                          friendships: FrozenSet[Tuple[str, str]]) -> List[Step1Scenario]:
-        """Δημιουργία σεναρίων με immutable structure"""
-        class_labels_list = [f"Α{i+1}" for i in range(num_classes)]
+                          friendships: FrozenSet[Tuple[str, str]],
+                          search: str = "bnb",
+                          contract_friends: bool = False,
+                          time_budget: Optional[float] = None,
+                          max_exact_space: int = MAX_EXACT_SEARCH_SPACE,
+                          seed: int = RANDOM_SEED,
+                          workers: int = 1,
+                          name_index: Optional[Dict[str, int]] = None) -> List[Step1Scenario]:
+        """Δημιουργία σεναρίων με immutable structure (name_index: κοινό για όλα τα σενάρια)"""
+        class_labels = tuple(f"Α{i+1}" for i in range(num_classes))
+        kids = tuple(teacher_kids)
+        if name_index is None:
+            name_index = name_index_for(kids)
+        typecode = _code_typecode(num_classes)
         scenarios = []
+        self._search_info = {"search": "exact"}
         
         if len(teacher_kids) <= num_classes:
             # ΚΑΝΟΝΑΣ 1: Σειριακή κατανομή
             print(f"Εφαρμογή Κανόνα 1 (≤1 ανά τμήμα)")
-            assignments = {}
-            
-            for i, name in enumerate(teacher_kids):
-                assignments[name] = class_labels_list[i % num_classes]
+            codes = array(typecode, (i % num_classes for i in range(len(kids))))
             
             scenario = Step1Scenario(
                 id=1,
                 column_name="ΒΗΜΑ1_ΣΕΝΑΡΙΟ_1",
-                assignments=assignments,
+                teacher_kids=kids,
+                class_labels=class_labels,
+                codes=codes,
                 description="Κανόνας 1: Σειριακή κατανομή ≤1/τμήμα",
-                broken_friendships=0
+                broken_friendships=0,
+                metadata={"search": "exact"},
+                name_index=name_index
             )
             scenarios.append(scenario)
         else:
             # ΚΑΝΟΝΑΣ 2: Εξαντλητική παραγωγή
             print(f"Εφαρμογή Κανόνα 2 (εξαντλητική με φιλίες)")
-            valid_assignments = self._exhaustive_generation(teacher_kids, num_classes, friendships)
+            space = self._estimate_search_space(len(teacher_kids), num_classes)
+            self._search_info["search_space"] = space
+            valid_assignments = []
+            if contract_friends and friendships:
+                valid_assignments = self._contracted_generation(teacher_kids, num_classes, friendships)
+                if not valid_assignments:
+                    print("Καμία κατανομή χωρίς σπάσιμο ομάδας φίλων - πλήρης αναζήτηση")
+            if not valid_assignments:
+                if search == "sample" or space > max_exact_space:
+                    budget = DEFAULT_TIME_BUDGET_S if time_budget is None else time_budget
+                    print(f"Χώρος αναζήτησης {space:,} > {max_exact_space:,} - δειγματοληψία ({budget}s)")
+                    valid_assignments = self._sampled_generation(
+                        teacher_kids, num_classes, friendships, time_budget=budget, seed=seed
+                    )
+                    self._search_info.update({"search": "sampled", "time_budget": budget, "seed": seed})
+                elif search == "exhaustive":
+                    valid_assignments = self._exhaustive_generation(teacher_kids, num_classes, friendships)
+                else:
+                    valid_assignments = self._branch_and_bound_generation(
+                        teacher_kids, num_classes, friendships, workers=workers
+                    )
             
-            for i, (assignments_dict, broken_count) in enumerate(valid_assignments[:5], 1):
+            for i, (codes, broken_count) in enumerate(valid_assignments[:5], 1):
                 scenario = Step1Scenario(
                     id=i,
                     column_name=f"ΒΗΜΑ1_ΣΕΝΑΡΙΟ_{i}",
-                    assignments=assignments_dict,
+                    teacher_kids=kids,
+                    class_labels=class_labels,
+                    codes=codes,
                     description="Κανόνας 2: Ισόρροπη κατανομή",
-                    broken_friendships=broken_count
+                    broken_friendships=broken_count,
+                    metadata={"search": self._search_info["search"]},
+                    name_index=name_index
                 )
                 scenarios.append(scenario)
         
         return scenarios
-    
+
+    def _estimate_search_space(self, n: int, num_classes: int) -> int:
+        """Πλήθος canonical ισόρροπων κατανομών n παιδιών σε num_classes τμήματα."""
+        q, r = divmod(n, num_classes)
+        denom = (math.factorial(q + 1) ** r) * (math.factorial(q) ** (num_classes - r))
+        denom *= math.factorial(r) * math.factorial(num_classes - r)
+        return math.factorial(n) // denom
+
+    def _sampled_generation(self, teacher_kids: List[str], num_classes: int,
+                            friendships: FrozenSet[Tuple[str, str]],
+                            time_budget: float = DEFAULT_TIME_BUDGET_S,
+                            seed: int = RANDOM_SEED,
+                            top_k: int = 5) -> List[Tuple[array, int]]:
+        """
+        Anytime εναλλακτική για πολύ μεγάλους χώρους αναζήτησης.
+
+        Επαναλαμβάνει (έως να λήξει το time_budget): τυχαία ισόρροπη κατανομή (seeded)
+        και τοπική βελτίωση με ανταλλαγές παιδιών μεταξύ τμημάτων, που κρατούν τα μεγέθη.
+        Κρατά τα top_k διακριτά (canonical) σενάρια με τις λιγότερες σπασμένες φιλίες·
+        αν κάποιο έχει 0, κρατά μόνο όσα έχουν 0, όπως η ακριβής αναζήτηση.
+        """
+        n = len(teacher_kids)
+        if num_classes < 2:
+            return []
+        rng = random.Random(seed)
+        deadline = time.monotonic() + max(0.0, time_budget)
+
+        index = {name: i for i, name in enumerate(teacher_kids)}
+        adj: List[List[int]] = [[] for _ in range(n)]
+        edges = []
+        for a, b in friendships:
+            ia, ib = index.get(a), index.get(b)
+            if ia is None or ib is None or ia == ib:
+                continue
+            adj[ia].append(ib)
+            adj[ib].append(ia)
+            edges.append((ia, ib))
+
+        q, r = divmod(n, num_classes)
+        sizes = [q + 1] * r + [q] * (num_classes - r)
+        found: Dict[Tuple[int, ...], int] = {}
+        stats = {"restarts": 0, "swaps": 0}
+
+        def canonical(codes: List[int]) -> Tuple[int, ...]:
+            relabel: Dict[int, int] = {}
+            return tuple(relabel.setdefault(c, len(relabel)) for c in codes)
+
+        def record(codes: List[int], broken: int) -> None:
+            found[canonical(codes)] = broken
+            if len(found) > 20 * top_k:
+                keep = sorted(found.items(), key=lambda kv: (kv[1], kv[0]))[:top_k]
+                found.clear()
+                found.update(keep)
+
+        def local(codes: List[int], i: int) -> int:
+            return sum(1 for u in adj[i] if codes[u] != codes[i])
+
+        while True:
+            order = list(range(n))
+            rng.shuffle(order)
+            codes = [0] * n
+            pos = 0
+            for c, size in enumerate(sizes):
+                for i in order[pos:pos + size]:
+                    codes[i] = c
+                pos += size
+            broken = sum(1 for a, b in edges if codes[a] != codes[b])
+            record(codes, broken)
+            stats["restarts"] += 1
+
+            improved = True
+            while improved and time.monotonic() < deadline:
+                improved = False
+                for a in rng.sample(range(n), n):
+                    for b in range(n):
+                        if codes[a] == codes[b]:
+                            continue
+                        before = local(codes, a) + local(codes, b)
+                        codes[a], codes[b] = codes[b], codes[a]
+                        delta = local(codes, a) + local(codes, b) - before
+                        if delta < 0:
+                            broken += delta
+                            record(codes, broken)
+                            stats["swaps"] += 1
+                            improved = True
+                        else:
+                            codes[a], codes[b] = codes[b], codes[a]
+            if time.monotonic() >= deadline:
+                break
+
+        top = sorted(found.items(), key=lambda kv: (kv[1], kv[0]))[:top_k]
+        if top and top[0][1] == 0:
+            top = [kv for kv in top if kv[1] == 0]
+        print(f"Δειγματοληψία: {stats['restarts']} επανεκκινήσεις, {stats['swaps']} βελτιώσεις, "
+              f"{len(found)} διακριτά σενάρια")
+
+        typecode = _code_typecode(num_classes)
+        return [(array(typecode, cs), broken) for cs, broken in top]
+
     def _exhaustive_generation(self, teacher_kids: List[str], num_classes: int, 
-                             friendships: FrozenSet[Tuple[str, str]]) -> List[Tuple[Dict[str, str], int]]:
-        """Εξαντλητική παραγωγή σεναρίων"""
-        class_labels_list = [f"Α{i+1}" for i in range(num_classes)]
+                             friendships: FrozenSet[Tuple[str, str]]) -> List[Tuple[array, int]]:
+        """Εξαντλητική παραγωγή σεναρίων (συμπαγείς πίνακες κωδικών, όχι dict ανά σενάριο)"""
+        typecode = _code_typecode(num_classes)
+        index = {name: i for i, name in enumerate(teacher_kids)}
+        edges = [(index[a], index[b]) for a, b in friendships if a in index and b in index]
+        # Φιλία με ακριβώς ένα παιδί εκτός λίστας σπάει σε κάθε σενάριο
+        outside = sum(1 for a, b in friendships if (a in index) != (b in index))
         valid_scenarios = []
-        seen_canonical = set()
         
         print(f"Παραγωγή σεναρίων για {len(teacher_kids)} παιδιά σε {num_classes} τμήματα...")
         
-        # Εξαντλητική παραγωγή
+        # Εξαντλητική παραγωγή: μόνο ισόρροπες (≤1) & canonical κατανομές, χωρίς K^N σάρωση
         total_combinations = num_classes ** len(teacher_kids)
-        print(f"Συνολικές περιπτώσεις: {total_combinations:,}")
-        
-        for assignment in itertools.product(class_labels_list, repeat=len(teacher_kids)):
-            assign_map = {teacher_kids[i]: assignment[i] for i in range(len(teacher_kids))}
-            
-            # ΕΛΕΓΧΟΣ 1: Ισοκατανομή ≤1
-            class_counts = {c: 0 for c in class_labels_list}
-            for name in teacher_kids:
-                class_counts[assign_map[name]] += 1
-            
-            counts_list = list(class_counts.values())
-            if max(counts_list) - min(counts_list) > 1:
-                continue  # Απόρριψη ανισοκατανομής >1
-            
-            # ΕΛΕΓΧΟΣ 2: Όχι όλα στο ίδιο τμήμα
-            unique_classes = set(assign_map.values())
-            if len(unique_classes) == 1:
-                continue  # Απόρριψη
-            
-            # ΕΛΕΓΧΟΣ 3: Canonical uniqueness
-            canon_key = self._canonical_key(teacher_kids, assign_map, class_labels_list)
-            if canon_key in seen_canonical:
+        print(f"Συνολικές περιπτώσεις (K^N): {total_combinations:,}")
+
+        for codes in self._balanced_partitions(len(teacher_kids), num_classes):
+            # ΕΛΕΓΧΟΣ: Όχι όλα στο ίδιο τμήμα
+            if len(set(codes)) == 1:
                 continue
-            seen_canonical.add(canon_key)
-            
+
             # Υπολογισμός σπασμένων φιλιών
-            broken_friendships = self._count_broken_friendships(teacher_kids, assign_map, friendships)
+            broken_friendships = outside + sum(1 for ia, ib in edges if codes[ia] != codes[ib])
             
-            valid_scenarios.append((assign_map, broken_friendships))
+            valid_scenarios.append((array(typecode, codes), broken_friendships))
         
         print(f"Έγκυρα σενάρια: {len(valid_scenarios)}")
         
@@ -430,27 +1192,218 @@ class Step1ImmutableProcessor:
         print(f"Τελική επιλογή: {len(valid_scenarios)} σενάρια")
         return valid_scenarios
 
+    def _branch_and_bound_generation(self, teacher_kids: List[str], num_classes: int,
+                                     friendships: FrozenSet[Tuple[str, str]],
+                                     top_k: int = 5,
+                                     workers: int = 1) -> List[Tuple[array, int]]:
+        """
+        Branch-and-bound εκδοχή του _exhaustive_generation με ΙΔΙΟ αποτέλεσμα.
+
+        Κρατά heap με τα top_k καλύτερα σενάρια (κλειδί: σπασμένες φιλίες, σειρά παραγωγής).
+        Κάτω φράγμα ενός μερικού σεναρίου = φιλίες που έχουν ήδη σπάσει + φιλίες προς
+        ατοποθέτητα παιδιά που θα σπάσουν σε κάθε περίπτωση· κάθε υποδέντρο που δεν
+        μπορεί να νικήσει το χειρότερο του heap κόβεται. Μόνο τα τελικά σενάρια
+        γίνονται συμπαγείς πίνακες κωδικών, άρα η μνήμη μένει σταθερή.
+
+        workers > 1: το δέντρο χωρίζεται σε shards ανά canonical πρόθεμα των πρώτων
+        παιδιών και κάθε shard τρέχει σε ProcessPoolExecutor. Τα shards είναι ξένα μεταξύ
+        τους και διατεταγμένα όπως η σειριακή παραγωγή, άρα η συγχώνευση των τοπικών
+        top_k με κλειδί (σπασμένες, shard, σειρά) δίνει ακριβώς το σειριακό αποτέλεσμα.
+        """
+        n = len(teacher_kids)
+        print(f"Παραγωγή σεναρίων (branch-and-bound) για {n} παιδιά σε {num_classes} τμήματα...")
+
+        # Για κάθε παιδί i: φίλοι j > i (ενημερώνονται όταν τοποθετηθεί το i)
+        index = {name: i for i, name in enumerate(teacher_kids)}
+        fwd_edges: List[List[int]] = [[] for _ in range(n)]
+        for a, b in friendships:
+            ia, ib = index.get(a), index.get(b)
+            if ia is None or ib is None or ia == ib:
+                continue
+            fwd_edges[min(ia, ib)].append(max(ia, ib))
+
+        prefixes: List[Tuple[int, ...]] = [()]
+        if workers > 1:
+            depth = 0
+            while depth < n and len(prefixes) < 4 * workers:
+                depth += 1
+                prefixes = list(self._balanced_partitions(n, num_classes, depth=depth))
+            print(f"Παράλληλη αναζήτηση: {len(prefixes)} shards (πρόθεμα {depth} παιδιών) σε {workers} workers")
+
+        if len(prefixes) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                shard_results = list(pool.map(
+                    _bnb_shard,
+                    [n] * len(prefixes), [num_classes] * len(prefixes),
+                    [fwd_edges] * len(prefixes), prefixes, [top_k] * len(prefixes),
+                ))
+        else:
+            shard_results = [_bnb_shard(n, num_classes, fwd_edges, prefixes[0], top_k)]
+
+        merged = []
+        leaves = pruned = 0
+        for shard_idx, (items, shard_leaves, shard_pruned) in enumerate(shard_results):
+            merged.extend((broken, (shard_idx, seq), cs) for broken, seq, cs in items)
+            leaves += shard_leaves
+            pruned += shard_pruned
+
+        top = sorted(merged)[:top_k]
+        if not pruned and leaves <= top_k:
+            # Όπως στην εξαντλητική: ≤top_k σενάρια κρατούν τη σειρά παραγωγής
+            top.sort(key=lambda x: x[1])
+        elif top and top[0][0] == 0:
+            # Όπως στην εξαντλητική: αν υπάρχουν σενάρια χωρίς σπασμένες φιλίες, μόνο αυτά
+            top = [x for x in top if x[0] == 0]
+        print(f"Σενάρια που αξιολογήθηκαν: {leaves}, κλάδοι που κόπηκαν: {pruned}")
+
+        typecode = _code_typecode(num_classes)
+        valid_scenarios = [(array(typecode, cs), broken) for broken, _seq, cs in top]
+        print(f"Τελική επιλογή: {len(valid_scenarios)} σενάρια")
+        return valid_scenarios
+
+
+def _bnb_shard(n: int, num_classes: int, fwd_edges: List[List[int]],
+               prefix: Tuple[int, ...], top_k: int) -> Tuple[List[Tuple[int, int, Tuple[int, ...]]], int, int]:
+    """
+    Branch-and-bound σε ένα shard (όλες οι κατανομές που ξεκινούν με prefix).
+
+    Επιστρέφει ([(σπασμένες, σειρά, codes), ...] ταξινομημένα, φύλλα, κλάδοι που κόπηκαν).
+    Module-level ώστε να εκτελείται σε ProcessPoolExecutor.
+    """
+    q, r = divmod(n, num_classes)
+    cap = q + (1 if r > 0 else 0)
+    counts = [0] * num_classes
+    codes = [0] * n
+    heap: List[Tuple[int, int, Tuple[int, ...]]] = []  # (-broken, -seq, codes)
+    stats = {"leaves": 0, "pruned": 0}
+
+    # Κάτω φράγμα: για κάθε ατοποθέτητο u, οι ήδη τοποθετημένοι φίλοι του εκτός του
+    # "καλύτερου" τμήματος θα σπάσουν σίγουρα: placed[u] - best[u]
+    in_class = [[0] * num_classes for _ in range(n)]
+    placed = [0] * n
+    best = [0] * n
+    lb = {"pending": 0}
+
+    def feasible(remaining: int) -> bool:
+        need = sum(q - c for c in counts if c < q)
+        room = sum(cap - c for c in counts)
+        return need <= remaining <= room
+
+    def rec(i: int, opened: int, broken: int) -> None:
+        if len(heap) == top_k and broken + lb["pending"] >= -heap[0][0]:
+            stats["pruned"] += 1
+            return
+        if i == n:
+            if len(set(codes)) == 1:
+                return
+            item = (-broken, -stats["leaves"], tuple(codes))
+            stats["leaves"] += 1
+            if len(heap) < top_k:
+                heapq.heappush(heap, item)
+            else:
+                heapq.heapreplace(heap, item)
+            return
+        lb["pending"] -= placed[i] - best[i]
+        choices = range(min(opened + 1, num_classes)) if i >= len(prefix) else (prefix[i],)
+        for c in choices:
+            if counts[c] >= cap:
+                continue
+            counts[c] += 1
+            if feasible(n - i - 1):
+                codes[i] = c
+                saved = []
+                for u in fwd_edges[i]:
+                    saved.append(best[u])
+                    lb["pending"] -= placed[u] - best[u]
+                    in_class[u][c] += 1
+                    placed[u] += 1
+                    if in_class[u][c] > best[u]:
+                        best[u] = in_class[u][c]
+                    lb["pending"] += placed[u] - best[u]
+                rec(i + 1, max(opened, c + 1), broken + placed[i] - in_class[i][c])
+                for u, old_best in zip(reversed(fwd_edges[i]), reversed(saved)):
+                    lb["pending"] -= placed[u] - best[u]
+                    in_class[u][c] -= 1
+                    placed[u] -= 1
+                    best[u] = old_best
+                    lb["pending"] += placed[u] - best[u]
+            counts[c] -= 1
+        lb["pending"] += placed[i] - best[i]
+
+    rec(0, 0, 0)
+
+    items = sorted((-neg_b, -neg_seq, cs) for neg_b, neg_seq, cs in heap)
+    return items, stats["leaves"], stats["pruned"]
+
 
 # === UTILITY FUNCTIONS ===
 
-def create_immutable_step1(df: pd.DataFrame, num_classes: Optional[int] = None) -> Tuple[pd.DataFrame, Step1Results]:
+def create_immutable_step1(df: pd.DataFrame, num_classes: Optional[int] = None,
+                           search: str = "bnb",
+                           contract_friends: bool = False,
+                           time_budget: Optional[float] = None,
+                           max_exact_space: int = MAX_EXACT_SEARCH_SPACE,
+                           workers: int = 1,
+                           cache_dir: Optional[str] = None) -> Tuple[pd.DataFrame, Step1Results]:
     """
     Δημιουργεί immutable αποτελέσματα βήματος 1.
     
     Args:
         df: Αρχικό DataFrame με δεδομένα μαθητών
         num_classes: Αριθμός τμημάτων (αν None, αυτόματος υπολογισμός)
+        search: "bnb" (branch-and-bound, default) ή "exhaustive"
+        contract_friends: Συγχώνευση ομάδων φίλων πριν την αναζήτηση (προαιρετικό)
+        time_budget: Χρονικό όριο (s) της δειγματοληψίας όταν ο χώρος αναζήτησης
+            ξεπερνά το max_exact_space (αν None, DEFAULT_TIME_BUDGET_S)
+        max_exact_space: Όριο πλήθους κατανομών για ακριβή αναζήτηση
+        workers: Διεργασίες για παράλληλη ακριβή αναζήτηση (1 = σειριακά)
+        cache_dir: Φάκελος για cache αποτελεσμάτων (αν None, χωρίς cache)
     
     Returns:
         (DataFrame με στήλες ΒΗΜΑ1_ΣΕΝΑΡΙΟ_X, Step1Results object)
     """
     processor = Step1ImmutableProcessor()
-    results = processor.create_scenarios(df, num_classes)
+    results = processor.create_scenarios(df, num_classes, search=search,
+                                         contract_friends=contract_friends,
+                                         time_budget=time_budget,
+                                         max_exact_space=max_exact_space,
+                                         workers=workers,
+                                         cache_dir=cache_dir)
     updated_df = processor.apply_to_dataframe(df)
     
     return updated_df, results
 
 
+def update_step1(previous_results: Step1Results, df_new: pd.DataFrame,
+                 max_changes: int = MAX_REPAIR_CHANGES,
+                 search: Optional[str] = None,
+                 time_budget: Optional[float] = None,
+                 workers: int = 1,
+                 contract_friends: Optional[bool] = None,
+                 max_exact_space: Optional[int] = None,
+                 seed: Optional[int] = None,
+                 cache_dir: Optional[str] = None) -> Tuple[pd.DataFrame, Step1Results]:
+    """
+    Ενημέρωση κλειδωμένου Βήματος 1 μετά από μικρή αλλαγή στα παιδιά εκπαιδευτικών
+    (π.χ. εκπρόθεσμη εγγραφή): επισκευάζει τοπικά τα προηγούμενα σενάρια αντί να
+    ξανατρέξει την πλήρη αναζήτηση (βλ. Step1ImmutableProcessor.update_scenarios).
+    Οι ρυθμίσεις αναζήτησης που είναι None παίρνονται από την αρχική παραγωγή.
+
+    Returns:
+        (DataFrame με στήλες ΒΗΜΑ1_ΣΕΝΑΡΙΟ_X, Step1Results object)
+    """
+    processor = Step1ImmutableProcessor()
+    results = processor.update_scenarios(previous_results, df_new, max_changes=max_changes,
+                                         search=search, time_budget=time_budget, workers=workers,
+                                         contract_friends=contract_friends,
+                                         max_exact_space=max_exact_space, seed=seed,
+                                         cache_dir=cache_dir)
+    updated_df = processor.apply_to_dataframe(df_new)
+
+    return updated_df, results
+
+
 def validate_step1_immutability(df: pd.DataFrame, results: Step1Results) -> bool:
     """Επικυρώνει ότι το DataFrame τηρεί την immutability του Step1"""
     try:
@@ -545,13 +1498,119 @@ def export_exact_multisheet(df_with_step1: __pd_exact.DataFrame, output_file: st
             df_out = df_with_step1[base_cols + [col]].copy()
             df_out.to_excel(writer, index=False, sheet_name=str(col)[:31])
 
+def __cell_exact(value):
+    """
+    Τιμή κελιού για xlsxwriter: κενό string / None / NaN / NaT / pd.NA -> None (κενό κελί),
+    Timestamp -> datetime, numpy scalar -> Python.
+    """
+    if isinstance(value, str):
+        return value if value != "" else None
+    if value is None or (__pd_exact.api.types.is_scalar(value) and __pd_exact.isna(value)):
+        return None
+    if isinstance(value, (__pd_exact.Timestamp, np.datetime64)):
+        return __pd_exact.Timestamp(value).to_pydatetime()
+    if isinstance(value, np.generic):
+        value = value.item()
+    return value
+
+def __write_sheet_streaming(workbook, sheet_name: str, df: __pd_exact.DataFrame) -> None:
+    import datetime as _dt
+
+    # Ίδιες μορφές ημερομηνίας με το pandas ExcelWriter (openpyxl layout)
+    datetime_fmt = workbook.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+    date_fmt = workbook.add_format({"num_format": "yyyy-mm-dd"})
+    ws = workbook.add_worksheet(sheet_name[:31])
+    ws.write_row(0, 0, [str(c) for c in df.columns])
+    for r, row in enumerate(df.itertuples(index=False, name=None), start=1):
+        for c, value in enumerate(row):
+            value = __cell_exact(value)
+            if value is None:
+                continue
+            if isinstance(value, float) and math.isinf(value):
+                # το xlsxwriter δεν γράφει ±inf ως αριθμό· ως "inf"/"-inf" διαβάζεται πίσω ως float
+                ws.write_string(r, c, str(value))
+            elif isinstance(value, _dt.datetime):
+                ws.write_datetime(r, c, value, datetime_fmt)
+            elif isinstance(value, _dt.date):
+                ws.write_datetime(r, c, value, date_fmt)
+            else:
+                ws.write(r, c, value)
+
+def export_columnar(df_with_step1: __pd_exact.DataFrame, output_file: str) -> None:
+    """
+    Columnar εναλλακτική του export_exact_multisheet:
+      • φύλλο ΒΑΣΗ: οι αρχικές στήλες ΜΙΑ φορά
+      • φύλλο ΒΗΜΑ1_ΣΕΝΑΡΙΑ: ΟΝΟΜΑ + μία στήλη ΒΗΜΑ1_ΣΕΝΑΡΙΟ_k ανά σενάριο (ίδια σειρά γραμμών)
+    Γράφεται γραμμή-γραμμή με xlsxwriter constant_memory (σταθερή μνήμη).
+    Διαβάζεται πίσω με read_step1_columnar.
+    """
+    import xlsxwriter
+    scenario_cols = [c for c in df_with_step1.columns if str(c).startswith("ΒΗΜΑ1_ΣΕΝΑΡΙΟ_")]
+    scenario_cols = sorted(scenario_cols, key=__scenario_index_exact)
+    base_cols = [c for c in df_with_step1.columns if c not in scenario_cols]
+    # strings_to_urls=False: κείμενο "http…" μένει κείμενο, όπως στο openpyxl layout
+    workbook = xlsxwriter.Workbook(str(output_file), {"constant_memory": True, "strings_to_urls": False})
+    try:
+        __write_sheet_streaming(workbook, COLUMNAR_BASE_SHEET, df_with_step1[base_cols])
+        __write_sheet_streaming(workbook, COLUMNAR_SCENARIOS_SHEET, df_with_step1[["ΟΝΟΜΑ"] + scenario_cols])
+    finally:
+        workbook.close()
+
+def probe_sheet_headers(xl) -> Dict[str, List[str]]:
+    """
+    Επικεφαλίδες (γραμμή 1) κάθε φύλλου χωρίς φόρτωση δεδομένων: {φύλλο: [στήλες]}.
+    Δέχεται path ή pd.ExcelFile. openpyxl read_only + iter_rows(max_row=1) για .xlsx
+    (σε pd.ExcelFile ξαναχρησιμοποιείται το ήδη ανοιχτό read_only workbook)·
+    για άλλες μορφές, parse με nrows=0.
+    """
+    from openpyxl import load_workbook
+    from openpyxl.workbook.workbook import Workbook
+
+    if isinstance(xl, __pd_exact.ExcelFile):
+        wb, owned = xl.book, False
+    else:
+        try:
+            wb, owned = load_workbook(xl, read_only=True, data_only=True), True
+        except Exception:
+            xl = __pd_exact.ExcelFile(xl)
+            wb, owned = xl.book, False
+    if not isinstance(wb, Workbook):
+        return {s: [str(c) for c in xl.parse(s, nrows=0).columns] for s in xl.sheet_names}
+    try:
+        headers = {}
+        for ws in wb.worksheets:
+            row = next(ws.iter_rows(max_row=1, values_only=True), ())
+            headers[ws.title] = ["" if v is None else str(v) for v in row]
+        return headers
+    finally:
+        if owned:
+            wb.close()
+
+def read_step1_columnar(xl) -> Optional[__pd_exact.DataFrame]:
+    """
+    Αν το workbook (path ή pd.ExcelFile) είναι columnar export του Βήματος 1, επιστρέφει
+    ΕΝΑ DataFrame: βάση + όλες οι στήλες ΒΗΜΑ1_ΣΕΝΑΡΙΟ_k. Αλλιώς None.
+    """
+    if not isinstance(xl, __pd_exact.ExcelFile):
+        xl = __pd_exact.ExcelFile(xl)
+    if COLUMNAR_BASE_SHEET not in xl.sheet_names or COLUMNAR_SCENARIOS_SHEET not in xl.sheet_names:
+        return None
+    base = xl.parse(COLUMNAR_BASE_SHEET)
+    scen = xl.parse(COLUMNAR_SCENARIOS_SHEET)
+    if len(base) != len(scen) or (
+        "ΟΝΟΜΑ" in base.columns and not base["ΟΝΟΜΑ"].astype(str).equals(scen["ΟΝΟΜΑ"].astype(str))
+    ):
+        raise ValueError(f"Το φύλλο {COLUMNAR_SCENARIOS_SHEET} δεν αντιστοιχεί γραμμή-γραμμή στο {COLUMNAR_BASE_SHEET}")
+    scenario_cols = [c for c in scen.columns if str(c).startswith("ΒΗΜΑ1_ΣΕΝΑΡΙΟ_")]
+    return __pd_exact.concat([base, scen[scenario_cols]], axis=1)
+
 # ===============================
 # CLI entrypoint
 # ===============================
 def _auto_pick_sheet(xl):
+    headers = probe_sheet_headers(xl)
     for s in xl.sheet_names:
-        df_try = xl.parse(s)
-        cands = [c for c in df_try.columns if str(c).startswith("ΒΗΜΑ1_ΣΕΝΑΡΙΟ_")]
+        cands = [c for c in headers.get(s, []) if str(c).startswith("ΒΗΜΑ1_ΣΕΝΑΡΙΟ_")]
         if cands:
             return s
     return xl.sheet_names[0]
@@ -563,6 +1622,14 @@ if __name__ == "__main__":
     parser.add_argument("--sheet", "-s", default=None, help="(optional) Sheet name")
     parser.add_argument("--num-classes", "-n", type=int, default=None, help="Force number of classes (optional)")
     parser.add_argument("--output", "-o", default="STEP1_IMMUTABLE_MULTISHEET_NODUP.xlsx", help="Output filename")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help=f"Seconds for sampled search on very large inputs (default: {DEFAULT_TIME_BUDGET_S})")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes for the exact branch-and-bound search (default: 1)")
+    parser.add_argument("--cache-dir", default=None,
+                        help="(optional) Directory for cached Step 1 results")
+    parser.add_argument("--layout", choices=("multisheet", "columnar"), default="multisheet",
+                        help="multisheet: one sheet per scenario (default); columnar: base roster once + one scenario sheet")
     args = parser.parse_args()
 
     import pandas as _pd
@@ -576,11 +1643,17 @@ if __name__ == "__main__":
     df0 = xl.parse(sheet_name)
 
     try:
-        df_with_step1, results_obj = create_immutable_step1(df0, num_classes=args.num_classes)
+        df_with_step1, results_obj = create_immutable_step1(
+            df0, num_classes=args.num_classes, time_budget=args.time_budget, workers=args.workers,
+            cache_dir=args.cache_dir
+        )
     except Exception as e:
         print("❌ Σφάλμα στο create_immutable_step1:", e)
         sys.exit(1)
 
-    export_exact_multisheet(df_with_step1, args.output)
-    print(f"✅ OK: {args.output}")
+    if args.layout == "columnar":
+        export_columnar(df_with_step1, args.output)
+    else:
+        export_exact_multisheet(df_with_step1, args.output)
+    print(f"✅ OK: {args.output} (αναζήτηση: {results_obj.metadata.get('search', 'exact')})")
 
@@ -40,12 +40,20 @@ def finalize_step2_assignments(
         num_classes = max(2, math.ceil(len(result_df) / 25))
         available_classes = [f"Α{i+1}" for i in range(num_classes)]
         placed_classes = pd.Series([0] * len(available_classes), index=available_classes)
-    unplaced_names = result_df[unplaced_mask]["ΟΝΟΜΑ"].tolist()
+    unplaced_names = result_df[unplaced_mask]["ΟΝΟΜΑ"]
     classes_by_size = placed_classes.sort_values().index.tolist()
-    for i, student_name in enumerate(unplaced_names):
-        target_class = classes_by_size[i % len(classes_by_size)]
-        student_idx = result_df[result_df["ΟΝΟΜΑ"] == student_name].index[0]
-        result_df.loc[student_idx, final_col_name] = target_class
+    # Round-robin από το μικρότερο τμήμα· κάθε όνομα γράφεται στην ΠΡΩΤΗ γραμμή του
+    # (σε διπλότυπα μετράει η τελευταία ανάθεση), με μία ανάθεση στο τέλος.
+    targets = [classes_by_size[i % len(classes_by_size)] for i in range(len(unplaced_names))]
+    named = result_df["ΟΝΟΜΑ"].notna()
+    first_row = pd.Series(result_df.index[named], index=result_df.loc[named, "ΟΝΟΜΑ"])
+    first_row = first_row[~first_row.index.duplicated(keep="first")]
+    rows = unplaced_names.map(first_row)
+    if rows.isna().any():
+        raise IndexError("Μη τοποθετημένος μαθητής χωρίς ΟΝΟΜΑ.")
+    writes = pd.Series(targets, index=rows.to_numpy())
+    writes = writes[~writes.index.duplicated(keep="last")]
+    result_df.loc[writes.index, final_col_name] = writes.to_numpy()
     final_distribution = result_df[final_col_name].value_counts().to_dict()
     stats = {
         "total_students": len(result_df),
@@ -88,6 +96,109 @@ def lock_step2_results(df: pd.DataFrame, step2_column: str) -> pd.DataFrame:
     return final_df
 
 # ------------------ Exporters ------------------
+def _is_step1_header(c) -> bool:
+    return str(c).strip().upper().startswith("ΒΗΜΑ1_ΣΕΝΑΡΙΟ_")
+
+def _iter_multisheet_frames(xls: pd.ExcelFile, sheets: List[str]):
+    """
+    Multi-sheet workbook του Βήματος 1: κάθε φύλλο γίνεται parse. Οι στήλες βάσης (όλες εκτός
+    των ΒΗΜΑ1_ΣΕΝΑΡΙΟ_) ελέγχονται με hash_pandas_object απέναντι στο πρώτο φύλλο· αν ταιριάζουν,
+    το frame χρησιμοποιεί την ΚΟΙΝΗ βάση του πρώτου φύλλου + τις στήλες σεναρίου του φύλλου.
+    Αλλιώς δίνεται το frame του ίδιου του φύλλου.
+    """
+    base = base_hash = None
+    for sh in sheets:
+        df = xls.parse(sh)
+        base_cols = [c for c in df.columns if not _is_step1_header(c)]
+        if base is None:
+            base = df[base_cols]
+            try:
+                base_hash = pd.util.hash_pandas_object(base, index=False)
+            except TypeError:
+                base_hash = None
+            yield df
+            continue
+        if base_hash is None or base_cols != list(base.columns) or len(df) != len(base):
+            yield df
+            continue
+        try:
+            same_base = base_hash.equals(pd.util.hash_pandas_object(df[base_cols], index=False))
+        except TypeError:
+            same_base = False
+        if not same_base:
+            yield df
+            continue
+        frame = base.copy(deep=False)
+        for k, c in enumerate(df.columns):
+            if _is_step1_header(c):
+                frame.insert(k, c, df[c])
+        yield frame
+
+def _iter_step1_frames(xls: pd.ExcelFile):
+    """
+    Φύλλα εισόδου Βήματος 1 ως DataFrames.
+    Columnar workbook (ΒΑΣΗ + ΒΗΜΑ1_ΣΕΝΑΡΙΑ): η βάση διαβάζεται μία φορά και δίνεται
+    ένα frame ανά σενάριο (βάση + ΒΗΜΑ1_ΣΕΝΑΡΙΟ_k), όπως θα ήταν το αντίστοιχο φύλλο
+    του multi-sheet export. Αλλιώς: ένα frame ανά φύλλο που έχει στήλη ΒΗΜΑ1_ΣΕΝΑΡΙΟ_
+    (ο έλεγχος γίνεται μόνο στις επικεφαλίδες, χωρίς parse των υπόλοιπων φύλλων)·
+    η κοινή βάση γίνεται parse μία φορά (_iter_multisheet_frames).
+    """
+    from step1_immutable_ALLINONE import read_step1_columnar, probe_sheet_headers
+
+    combined = read_step1_columnar(xls)
+    if combined is None:
+        headers = probe_sheet_headers(xls)
+        sheets = [
+            sh for sh in xls.sheet_names
+            if any(_is_step1_header(c) for c in headers.get(sh, []))
+        ]
+        yield from _iter_multisheet_frames(xls, sheets)
+        return
+    scenario_cols = [c for c in combined.columns if str(c).startswith("ΒΗΜΑ1_ΣΕΝΑΡΙΟ_")]
+    base_cols = [c for c in combined.columns if c not in scenario_cols]
+    for col in scenario_cols:
+        yield combined[base_cols + [col]]
+
+def _best_step2_column(df: pd.DataFrame, step1_col: str, sid: int, seed: int, max_results: int) -> pd.Series:
+    """
+    Βήμα 2 για ένα σενάριο: επιλέγει το καλύτερο option (penalty, σπασμένες, ped)
+    και επιστρέφει ΜΟΝΟ τη στήλη ΒΗΜΑ2 του (index = ΟΝΟΜΑ, ίδια σειρά γραμμών).
+    Module-level ώστε να εκτελείται σε ProcessPoolExecutor· το step2_apply_FIXED_v3
+    ξανακάνει seed σε κάθε κλήση, άρα το αποτέλεσμα δεν εξαρτάται από τον worker.
+    """
+    from step_2_zoiroi_idiaterotites_FIXED_v3_PATCHED import step2_apply_FIXED_v3
+
+    options = step2_apply_FIXED_v3(df, step1_col, seed=seed, max_results=max_results)
+    def key_fn(opt):
+        label, opt_df, m = opt
+        pen = m.get("penalty") if m.get("penalty") is not None else 10**9
+        bro = m.get("broken") if m.get("broken") is not None else 10**9
+        ped = m.get("ped_conflicts") if m.get("ped_conflicts") is not None else 10**9
+        return (pen, bro, ped)
+    best_label, best_df, best_metrics = sorted(options, key=key_fn)[0]
+
+    step2_col = f"ΒΗΜΑ2_ΣΕΝΑΡΙΟ_{sid}"
+    if step2_col not in best_df.columns:
+        cands = [c for c in best_df.columns if str(c).startswith("ΒΗΜΑ2_")]
+        if not cands:
+            raise RuntimeError(f"Δεν βρέθηκε στήλη ΒΗΜΑ2 στο αποτέλεσμα για σενάριο {sid}.")
+        step2_col = cands[0]
+    return best_df.set_index("ΟΝΟΜΑ")[step2_col]
+
+def _run_step2_jobs(jobs: List[Tuple[int, pd.DataFrame, str]], seed: int, max_results: int,
+                    workers: int = 1) -> List[pd.Series]:
+    """Τρέχει τα σενάρια (sid, df, step1_col) σειριακά ή σε process pool· ίδια σειρά με τα jobs."""
+    args = (
+        [df for _, df, _ in jobs], [col for _, _, col in jobs], [sid for sid, _, _ in jobs],
+        [seed] * len(jobs), [max_results] * len(jobs),
+    )
+    if workers > 1 and len(jobs) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        print(f"Βήμα 2: {len(jobs)} σενάρια σε {min(workers, len(jobs))} workers")
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            return list(pool.map(_best_step2_column, *args))
+    return list(map(_best_step2_column, *args))
+
 def export_step2_minimal_nextcol(
     step1_workbook_path: str,
     out_xlsx_path: str,
@@ -95,10 +206,13 @@ def export_step2_minimal_nextcol(
     seed: int = 42,
     max_results: int = 5,
     core_columns: Optional[List[str]] = None,
-    sheet_naming: str = "ΣΕΝΑΡΙΟ_{id}"
+    sheet_naming: str = "ΣΕΝΑΡΙΟ_{id}",
+    workers: int = 1
 ) -> None:
-    """Παλιός ελαφρύς exporter: κρατά βασικές στήλες + ΒΗΜΑ1/ΒΗΜΑ2."""
-    from step_2_zoiroi_idiaterotites_FIXED_v3_PATCHED import step2_apply_FIXED_v3
+    """
+    Παλιός ελαφρύς exporter: κρατά βασικές στήλες + ΒΗΜΑ1/ΒΗΜΑ2.
+    workers > 1: τα σενάρια τρέχουν παράλληλα (ίδιο αποτέλεσμα, ίδια σειρά φύλλων).
+    """
     from step_2_helpers_FIXED import (
         normalize_columns, extract_step1_id, find_step1_scenario_columns, pick_core_columns
     )
@@ -106,9 +220,9 @@ def export_step2_minimal_nextcol(
     xls = pd.ExcelFile(step1_workbook_path)
     seen_ids = set()
     outputs: Dict[int, Dict] = {}
+    jobs: List[Tuple[int, pd.DataFrame, str]] = []
 
-    for sh in xls.sheet_names:
-        df_raw = xls.parse(sh)
+    for df_raw in _iter_step1_frames(xls):
         df = normalize_columns(df_raw)
         step1_cols = find_step1_scenario_columns(df)
         for step1_col in step1_cols:
@@ -116,28 +230,13 @@ def export_step2_minimal_nextcol(
             if sid in seen_ids:
                 continue
             seen_ids.add(sid)
+            jobs.append((sid, df, step1_col))
 
-            options = step2_apply_FIXED_v3(df, step1_col, seed=seed, max_results=max_results)
-            def key_fn(opt):
-                label, opt_df, m = opt
-                pen = m.get("penalty") if m.get("penalty") is not None else 10**9
-                bro = m.get("broken") if m.get("broken") is not None else 10**9
-                ped = m.get("ped_conflicts") if m.get("ped_conflicts") is not None else 10**9
-                return (pen, bro, ped)
-            best_label, best_df, best_metrics = sorted(options, key=key_fn)[0]
-
-            step2_col = f"ΒΗΜΑ2_ΣΕΝΑΡΙΟ_{sid}"
-            if step2_col not in best_df.columns:
-                cands = [c for c in best_df.columns if str(c).startswith("ΒΗΜΑ2_")]
-                if not cands:
-                    raise RuntimeError(f"Δεν βρέθηκε στήλη ΒΗΜΑ2 για το σενάριο {sid}.")
-                step2_col = cands[0]
-
-            keep_core = pick_core_columns(best_df, core_columns)
-            cols = keep_core + [step1_col, step2_col]
-            minimal_df = best_df[cols].copy()
-
-            outputs[sid] = {"sheet_name": sheet_naming.format(id=sid), "df": minimal_df}
+    for (sid, df, step1_col), s_step2 in zip(jobs, _run_step2_jobs(jobs, seed, max_results, workers)):
+        keep_core = pick_core_columns(df, core_columns)
+        minimal_df = df[keep_core + [step1_col]].copy()
+        minimal_df[s_step2.name] = s_step2.to_numpy()
+        outputs[sid] = {"sheet_name": sheet_naming.format(id=sid), "df": minimal_df}
 
     with pd.ExcelWriter(out_xlsx_path, engine="xlsxwriter") as writer:
         for sid in sorted(outputs.keys()):
@@ -149,7 +248,8 @@ def export_step2_nextcol_full(
     *,
     seed: int = 42,
     max_results: int = 5,
-    sheet_naming: str = "ΣΕΝΑΡΙΟ_{id}"
+    sheet_naming: str = "ΣΕΝΑΡΙΟ_{id}",
+    workers: int = 1
 ) -> None:
     """
     ΝΕΟΣ DEFAULT EXPORTER — FULL:
@@ -157,12 +257,14 @@ def export_step2_nextcol_full(
     - Εκτελεί Βήμα 2 ανά σενάριο και προσθέτει τη «ΒΗΜΑ2_ΣΕΝΑΡΙΟ_{N}»
       αμέσως δεξιά από τη «ΒΗΜΑ1_ΣΕΝΑΡΙΟ_{N}». Ένα sheet ανά σενάριο.
     - Δεν γράφει καμία FINAL/audit στήλη.
+    - Δέχεται και columnar workbook του Βήματος 1 (ΒΑΣΗ + ΒΗΜΑ1_ΣΕΝΑΡΙΑ).
+    - workers > 1: τα σενάρια τρέχουν σε process pool· στον γονέα επιστρέφει μόνο
+      η επιλεγμένη στήλη ΒΗΜΑ2 και η σειρά των φύλλων μένει ίδια.
     """
-    from step_2_zoiroi_idiaterotites_FIXED_v3_PATCHED import step2_apply_FIXED_v3
-
     xls = pd.ExcelFile(step1_workbook_path)
     used_ids = set()
     outputs: Dict[int, Dict] = {}
+    jobs: List[Tuple[int, pd.DataFrame, str]] = []
 
     def _sid_from_col(col_name: str) -> int:
         m = re.search(r'ΣΕΝΑΡΙΟ[_\s]*(\d+)', str(col_name).upper())
@@ -171,45 +273,30 @@ def export_step2_nextcol_full(
     def _find_step1_cols(df: pd.DataFrame):
         return [c for c in df.columns if str(c).strip().upper().startswith("ΒΗΜΑ1_ΣΕΝΑΡΙΟ_")]
 
-    for sh in xls.sheet_names:
-        orig_df = xls.parse(sh)
+    for orig_df in _iter_step1_frames(xls):
         step1_cols = _find_step1_cols(orig_df)
         for step1_col in step1_cols:
             sid = _sid_from_col(step1_col)
             if sid in used_ids:
                 continue
             used_ids.add(sid)
+            jobs.append((sid, orig_df, step1_col))
+
+    for (sid, orig_df, step1_col), s_step2 in zip(jobs, _run_step2_jobs(jobs, seed, max_results, workers)):
+        step2_col = s_step2.name
+        if "ΟΝΟΜΑ" not in orig_df.columns:
+            raise RuntimeError("Το αρχικό φύλλο δεν έχει στήλη 'ΟΝΟΜΑ'.")
+        merged = orig_df.copy()
+        merged[step2_col] = merged["ΟΝΟΜΑ"].map(s_step2.to_dict())
+
+        cols = merged.columns.tolist()
+        if step2_col in cols:
+            cols.remove(step2_col)
+        idx = cols.index(step1_col) + 1 if step1_col in cols else len(cols)
+        cols = cols[:idx] + [step2_col] + cols[idx:]
+        merged = merged[cols]
 
-            options = step2_apply_FIXED_v3(orig_df.copy(), step1_col, seed=seed, max_results=max_results)
-            def key_fn(opt):
-                label, opt_df, m = opt
-                pen = m.get("penalty") if m.get("penalty") is not None else 10**9
-                bro = m.get("broken") if m.get("broken") is not None else 10**9
-                ped = m.get("ped_conflicts") if m.get("ped_conflicts") is not None else 10**9
-                return (pen, bro, ped)
-            best_label, best_df, best_metrics = sorted(options, key=key_fn)[0]
-
-            step2_col = f"ΒΗΜΑ2_ΣΕΝΑΡΙΟ_{sid}"
-            if step2_col not in best_df.columns:
-                cands = [c for c in best_df.columns if str(c).startswith("ΒΗΜΑ2_")]
-                if not cands:
-                    raise RuntimeError(f"Δεν βρέθηκε στήλη ΒΗΜΑ2 στο αποτέλεσμα για σενάριο {sid}.")
-                step2_col = cands[0]
-
-            if "ΟΝΟΜΑ" not in orig_df.columns:
-                raise RuntimeError("Το αρχικό φύλλο δεν έχει στήλη 'ΟΝΟΜΑ'.")
-            s_step2 = best_df.set_index("ΟΝΟΜΑ")[step2_col]
-            merged = orig_df.copy()
-            merged[step2_col] = merged["ΟΝΟΜΑ"].map(s_step2.to_dict())
-
-            cols = merged.columns.tolist()
-            if step2_col in cols:
-                cols.remove(step2_col)
-            idx = cols.index(step1_col) + 1 if step1_col in cols else len(cols)
-            cols = cols[:idx] + [step2_col] + cols[idx:]
-            merged = merged[cols]
-
-            outputs[sid] = {"sheet_name": sheet_naming.format(id=sid), "df": merged}
+        outputs[sid] = {"sheet_name": sheet_naming.format(id=sid), "df": merged}
 
     with pd.ExcelWriter(out_xlsx_path, engine="xlsxwriter") as writer:
         for sid in sorted(outputs.keys()):
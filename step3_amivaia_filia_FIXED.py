@@ -8,11 +8,13 @@ step3_amivaia_filia_FIXED.py
 - Υπολογίζει broken δυάδες & penalty, επιλέγει έως 5 καλύτερα σενάρια.
 """
 from typing import List, Tuple, Dict, Optional
+from collections import Counter
+import numpy as np
 import pandas as pd
 import re
 from pathlib import Path
 from step_3_helpers_FIXED import (
-    parse_friends_string, are_mutual_pair, mutual_dyads,
+    mutual_friend_index,
     count_broken_dyads, calculate_penalty_score_step3, select_best_scenarios
 )
 
@@ -23,18 +25,49 @@ def _auto_num_classes(df, override=None):
     k = max(2, math.ceil(n/25))
     return int(k if override is None else override)
 
-def _class_fits(df: pd.DataFrame, col: str, class_name: str, add: int=1) -> bool:
-    return (df[col]==class_name).sum() + add <= 25
+_COUNTER_KEYS = ("size", "boys", "girls", "zoiroi", "idiaiterotites")
+
+def _student_flags(df: pd.DataFrame) -> List[Tuple[int, int, int, int, int]]:
+    """Ανά γραμμή: (1, αγόρι, κορίτσι, ζωηρός, ιδιαιτερότητα) ως 0/1, με τη σειρά του _COUNTER_KEYS."""
+    n = len(df)
+    def _yes(col: str) -> List[int]:
+        if col not in df.columns:
+            return [0] * n
+        return (df[col].astype(str).str.strip().str.upper() == "Ν").astype(int).tolist()
+    gender = df["ΦΥΛΟ"].astype(str).str.upper() if "ΦΥΛΟ" in df.columns else pd.Series([""] * n, index=df.index)
+    boys = (gender == "Α").astype(int).tolist()
+    girls = (gender == "Κ").astype(int).tolist()
+    return list(zip([1] * n, boys, girls, _yes("ΖΩΗΡΟΣ"), _yes("ΙΔΙΑΙΤΕΡΟΤΗΤΑ")))
+
+def _update_counters(counters: Dict, class_name, flags: Tuple[int, ...], sign: int = 1) -> None:
+    c = counters.setdefault(class_name, dict.fromkeys(_COUNTER_KEYS, 0))
+    for key, f in zip(_COUNTER_KEYS, flags):
+        c[key] += sign * f
+
+def _class_counters(values: list, flags: List[Tuple[int, ...]]) -> Dict:
+    """Μετρητές ανά τμήμα (πληθυσμός, αγόρια, κορίτσια, ζωηροί, ιδιαιτερότητες) σε μία σάρωση."""
+    counters: Dict = {}
+    for cl, f in zip(values, flags):
+        if pd.notna(cl):
+            _update_counters(counters, cl, f)
+    return counters
+
+def _class_fits(counters: Dict, class_name: str, add: int=1) -> bool:
+    c = counters.get(class_name)
+    return (c["size"] if c else 0) + add <= 25
 
 def apply_step3_on_sheet(
     df2: pd.DataFrame,
     scenario_col: str,
-    num_classes: Optional[int] = None) -> Tuple[pd.DataFrame, Dict]:
+    num_classes: Optional[int] = None,
+    *,
+    mutual_index: Optional[Tuple[List[str], List[List[int]]]] = None) -> Tuple[pd.DataFrame, Dict]:
     """
     Παίρνει ένα DataFrame από Βήμα 2 (ένα sheet) και επιστρέφει:
     - df_after: με νέα στήλη ΒΗΜΑ3_ΣΕΝΑΡΙΟ_k (ίδιο όνομα με το sheet αλλά με 'ΒΗΜΑ3')
     - meta: {"broken": int, "penalty": int}
     Κανόνας: τοποθετούμε ΜΟΝΟ δυάδες (u,v) όπου u είναι unplaced, v είναι placed, και είναι αμοιβαία φίλοι.
+    mutual_index: έτοιμο mutual_friend_index(df2) (ίδιο ρόστερ για όλα τα σενάρια)· αλλιώς χτίζεται εδώ.
     """
     df = df2.copy()
     # νέα στήλη
@@ -42,34 +75,52 @@ def apply_step3_on_sheet(
     df[new_col] = df[scenario_col]
 
     placed = df[df[scenario_col].notna()][["ΟΝΟΜΑ", scenario_col]].set_index("ΟΝΟΜΑ")[scenario_col].to_dict()
-    # unplaced υποψήφιοι (γενικά όλοι οι κενές αναθέσεις)
-    unplaced_names = df[df[new_col].isna()]["ΟΝΟΜΑ"].astype(str).tolist()
+    # unplaced υποψήφιοι (γενικά όλοι οι κενές αναθέσεις), ως θέσεις γραμμών
+    unplaced_rows = np.flatnonzero(df[new_col].isna().to_numpy())
 
-    # δώσε προτεραιότητα σε όσους έχουν ΑΚΡΙΒΩΣ 1 αμοιβαίο φίλο (μονοσήμαντες δυάδες)
-    def mutual_friends_of(u: str) -> list:
-        cell = df.loc[df["ΟΝΟΜΑ"]==u, "ΦΙΛΟΙ"]
-        friends = parse_friends_string(cell.values[0] if not cell.empty else "")
-        return [v for v in friends if are_mutual_pair(df, u, v)]
+    # αμοιβαίες ακμές από τον δείκτη (ένα parse του ΦΙΛΟΙ ανά ρόστερ, όχι αναζήτηση ανά φίλο)
+    names, adj = mutual_index if mutual_index is not None else mutual_friend_index(df)
     # κατασκεύασε λίστα (u, v, class_v) για v ήδη placed
     candidates = []
-    for u in unplaced_names:
-        for v in mutual_friends_of(u):
+    for i in unplaced_rows:
+        u = names[i]
+        for j in adj[i]:
+            v = names[j]
             if v in placed:
                 candidates.append((u, v, placed[v]))
 
+    # δώσε προτεραιότητα σε όσους έχουν ΑΚΡΙΒΩΣ 1 αμοιβαίο φίλο (μονοσήμαντες δυάδες)
     # Ταξινόμηση: λιγότερες επιλογές πρώτα → μειώνει αδιέξοδα
-    degree = {u: len([1 for x in candidates if x[0]==u]) for u in unplaced_names}
+    degree = Counter(u for u, _, _ in candidates)
     candidates.sort(key=lambda t: (degree.get(t[0], 99), t[2]))
 
+    # Μετρητές τμημάτων: αρχικοποίηση μία φορά από τη στήλη Βήματος 2, ενημέρωση σε κάθε τοποθέτηση
+    current = df[new_col].tolist()
+    flags = _student_flags(df)
+    counters = _class_counters(current, flags)
+    rows_by_name: Dict[str, List[int]] = {}
+    for r, nm in enumerate(df["ΟΝΟΜΑ"].tolist()):
+        if isinstance(nm, str):
+            rows_by_name.setdefault(nm, []).append(r)
+
     used_u = set()
+    changed: Dict[int, object] = {}
     for u, v, cl in candidates:
         if u in used_u:
             continue
-        if _class_fits(df, new_col, cl, add=1):
-            df.loc[df["ΟΝΟΜΑ"]==u, new_col] = cl
+        if _class_fits(counters, cl, add=1):
+            for r in rows_by_name.get(u, []):
+                if pd.notna(current[r]):
+                    _update_counters(counters, current[r], flags[r], -1)
+                _update_counters(counters, cl, flags[r])
+                current[r] = changed[r] = cl
             used_u.add(u)
             # ενημέρωσε και το placed ώστε αν έχει κι άλλος φίλος τον u, τώρα να θεωρείται placed
             placed[u] = cl
+    if changed:
+        col = df[new_col].copy()
+        col.iloc[list(changed)] = list(changed.values())
+        df[new_col] = col
 
     # Μετρικά
     broken = count_broken_dyads(df2, df, new_col)
@@ -98,10 +149,12 @@ def apply_step3_to_dataframe(df_step2: pd.DataFrame, num_classes: Optional[int]
         raise ValueError("Δεν βρέθηκαν στήλες ΒΗΜΑ2_ΣΕΝΑΡΙΟ_* στο DataFrame")
     
     results = []
+    # Ίδιο ρόστερ για όλα τα σενάρια → ο δείκτης αμοιβαίων φιλιών χτίζεται μία φορά
+    mutual_index = mutual_friend_index(df_step2)
     
     # Εφαρμογή Βήματος 3 σε κάθε στήλη ΒΗΜΑ2
     for scenario_col in step2_columns:
-        df_after, meta = apply_step3_on_sheet(df_step2, scenario_col, num_classes)
+        df_after, meta = apply_step3_on_sheet(df_step2, scenario_col, num_classes, mutual_index=mutual_index)
         
         # Εξαγωγή της νέας στήλης ΒΗΜΑ3
         new_col = re.sub(r"^ΒΗΜΑ2", "ΒΗΜΑ3", scenario_col)
@@ -167,15 +220,19 @@ def export_step3_nextcol_full(step2_xlsx_path: str, out_xlsx_path: str) -> str:
     """
     import pandas as pd, re
     from pathlib import Path
+    from step1_immutable_ALLINONE import probe_sheet_headers
 
     p = Path(step2_xlsx_path)
     assert p.exists(), f"Δεν βρέθηκε: {p}"
     xls = pd.ExcelFile(p)
+    headers = probe_sheet_headers(xls)
 
     outputs = []
     for sh in xls.sheet_names:
-        # Δουλεύουμε με κάθε "ΣΕΝΑΡΙΟ_k" sheet
-        df2 = pd.read_excel(p, sheet_name=sh)
+        # Δουλεύουμε μόνο με sheets που έχουν στήλη ΒΗΜΑ2_ΣΕΝΑΡΙΟ_k (έλεγχος επικεφαλίδων)
+        if not any(str(c).strip().upper().startswith("ΒΗΜΑ2_ΣΕΝΑΡΙΟ_") for c in headers.get(sh, [])):
+            continue
+        df2 = xls.parse(sh)
         # βρες τη στήλη ΒΗΜΑ2_ΣΕΝΑΡΙΟ_k
         s2_cols = [c for c in df2.columns if str(c).strip().upper().startswith("ΒΗΜΑ2_ΣΕΝΑΡΙΟ_")]
         if not s2_cols:
@@ -20,6 +20,8 @@ import pandas as pd
 import numpy as np
 import re
 
+from step_2_helpers_FIXED import conflict_scores_by_class
+
 RANDOM_SEED = 42
 random.seed(RANDOM_SEED)
 
@@ -116,33 +118,14 @@ def _pairwise_penalty(counts: Dict[str, int], free: int, weight: int) -> int:
                 penalty += (diff - free) * weight
     return penalty
 
-def _pair_conflict_penalty(aZ, aI, bZ, bI) -> int:
-    """Ποινή παιδαγωγικής σύγκρουσης ανά ζεύγος."""
-    if aI and bI: return 5
-    if (aI and bZ) or (bI and aZ): return 4
-    if aZ and bZ: return 3
-    return 0
-
-def _class_conflict_sum(class_df: pd.DataFrame) -> int:
-    """Συνολική ποινή συγκρούσεων ενός τμήματος."""
-    s = 0
-    rows = class_df[['ΖΩΗΡΟΣ','ΙΔΙΑΙΤΕΡΟΤΗΤΑ']].fillna("").to_dict('records')
-    for i in range(len(rows)):
-        for j in range(i+1, len(rows)):
-            a = rows[i]; b = rows[j]
-            aZ = _is_yes(a.get('ΖΩΗΡΟΣ')); aI = _is_yes(a.get('ΙΔΙΑΙΤΕΡΟΤΗΤΑ'))
-            bZ = _is_yes(b.get('ΖΩΗΡΟΣ')); bI = _is_yes(b.get('ΙΔΙΑΙΤΕΡΟΤΗΤΑ'))
-            s += _pair_conflict_penalty(aZ, aI, bZ, bI)
-    return s
+def _yes_series(s: pd.Series) -> pd.Series:
+    return s.fillna("").map(_is_yes)
 
 def _all_conflicts_sum(df: pd.DataFrame, scenario_col: str) -> int:
     """Συνολική ποινή παιδαγωγικών συγκρούσεων."""
-    s = 0
-    for lab, class_df in df.groupby(scenario_col):
-        if not re.match(r"^Α\d+$", str(lab)):
-            continue
-        s += _class_conflict_sum(class_df)
-    return s
+    scores = conflict_scores_by_class(df, scenario_col, is_yes=_yes_series)
+    labels = scores.index.astype(str).str.match(r"^Α\d+$")
+    return int(scores.loc[labels, "conflict_sum"].sum())
 
 def _mutual_pairs(df: pd.DataFrame) -> List[Tuple[str,str]]:
     """Βρίσκει όλες τις *πλήρως αμοιβαίες* δυάδες από «ΦΙΛΟΙ»."""
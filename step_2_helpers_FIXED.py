@@ -75,26 +75,94 @@ def are_mutual_friends(df: pd.DataFrame, a: str, b: str) -> bool:
     fb = set(parse_friends_cell(rb.iloc[0].get("ΦΙΛΟΙ","")))
     return (str(b).strip() in fa) and (str(a).strip() in fb)
 
+def _str_col(df: pd.DataFrame, col: str) -> pd.Series:
+    # str() ανά κελί (όπως το παλιό iterrows)· το astype(str) κρατά τα NaN στο pandas 3
+    if col not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    return df[col].map(str).astype(object).str.strip()
+
 def scope_step2(df: pd.DataFrame, step1_col: str) -> Set[str]:
-    s = set()
-    for _, r in df.iterrows():
-        placed = pd.notna(r.get(step1_col))
-        z = str(r.get("ΖΩΗΡΟΣ","")).strip()=="Ν"
-        i = str(r.get("ΙΔΙΑΙΤΕΡΟΤΗΤΑ","")).strip()=="Ν"
-        pk = str(r.get("ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ","")).strip()=="Ν"
-        if (not placed and (z or i)) or (placed and pk):
-            s.add(str(r.get("ΟΝΟΜΑ","")).strip())
-    return s
+    """Μη τοποθετημένοι ζωηροί/ιδιαιτερότητες + τοποθετημένα παιδιά εκπαιδευτικών (μάσκες στηλών)."""
+    if df.empty:
+        return set()
+    placed = df[step1_col].notna() if step1_col in df.columns else pd.Series(False, index=df.index)
+    z = _str_col(df, "ΖΩΗΡΟΣ") == "Ν"
+    i = _str_col(df, "ΙΔΙΑΙΤΕΡΟΤΗΤΑ") == "Ν"
+    pk = _str_col(df, "ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ") == "Ν"
+    mask = (~placed & (z | i)) | (placed & pk)
+    return set(_str_col(df, "ΟΝΟΜΑ")[mask])
+
+# --------- Γράφος φιλιών (ένα ευρετήριο ανά ρόστερ) ---------
+_FRIEND_GRAPH_CACHE: Dict[tuple, Dict[str, object]] = {}
+
+def _friends_key_cell(x):
+    if isinstance(x, (list, tuple)):
+        return tuple(x)
+    return None if pd.isna(x) else str(x)
+
+def friend_graph(df: pd.DataFrame) -> Dict[str, object]:
+    """
+    Ευρετήριο φιλιών του ρόστερ: {"friends": όνομα -> set φίλων, "mutual": [(a, b), ...]}.
+    Όπως στο are_mutual_friends, μετράει η ΠΡΩΤΗ γραμμή κάθε ονόματος· τα ζεύγη
+    είναι ταξινομημένα με a < b. Το αποτέλεσμα κρατιέται ανά περιεχόμενο ΟΝΟΜΑ/ΦΙΛΟΙ,
+    άρα επαναλαμβανόμενες κλήσεις (π.χ. ανά σενάριο) δεν ξαναδιαβάζουν τα κελιά.
+    """
+    names = tuple(df["ΟΝΟΜΑ"].astype(str)) if "ΟΝΟΜΑ" in df.columns else ()
+    cells = tuple(map(_friends_key_cell, df["ΦΙΛΟΙ"])) if "ΦΙΛΟΙ" in df.columns else (None,) * len(names)
+    key = (names, cells)
+    graph = _FRIEND_GRAPH_CACHE.get(key)
+    if graph is None:
+        friends: Dict[str, Set[str]] = {}
+        for n, cell in zip(names, cells):
+            if n not in friends:
+                friends[n] = set(parse_friends_cell(list(cell) if isinstance(cell, tuple) else cell))
+        mutual = sorted(
+            (a, b) for a, fa in friends.items() for b in fa
+            if a < b and a in friends.get(b, ())
+        )
+        if len(_FRIEND_GRAPH_CACHE) >= 16:
+            _FRIEND_GRAPH_CACHE.clear()
+        graph = {"friends": friends, "mutual": mutual}
+        _FRIEND_GRAPH_CACHE[key] = graph
+    return graph
 
 def mutual_pairs_in_scope(df: pd.DataFrame, scope: Set[str]):
     scope = {str(x).strip() for x in scope if str(x).strip()}
-    pairs = []
-    names = sorted(scope)
-    for i, a in enumerate(names):
-        for b in names[i+1:]:
-            if are_mutual_friends(df, a, b):
-                pairs.append((a,b))
-    return pairs
+    return [(a, b) for a, b in friend_graph(df)["mutual"] if a in scope and b in scope]
+
+# --------- Παιδαγωγικές συγκρούσεις (κοινός πυρήνας Βημάτων 2 & 7) ---------
+def conflict_scores(n_I, n_Z):
+    """
+    Κλειστός τύπος για ένα τμήμα με n_I παιδιά με ιδιαιτερότητα (με ή χωρίς Ζ) και
+    n_Z ζωηρά χωρίς ιδιαιτερότητα. Ποινή ζεύγους: Ι+Ι=5, Ι+Ζ=4, Ζ+Ζ=3, αλλιώς 0.
+    Επιστρέφει (πλήθος ζευγών με ποινή, άθροισμα ποινών)· δουλεύει και με Series.
+    """
+    ii = n_I * (n_I - 1) // 2
+    iz = n_I * n_Z
+    zz = n_Z * (n_Z - 1) // 2
+    return ii + iz + zz, 5 * ii + 4 * iz + 3 * zz
+
+def conflict_scores_by_class(df: pd.DataFrame, class_col: str, is_yes=None) -> pd.DataFrame:
+    """
+    Ποινές συγκρούσεων ανά τμήμα με ένα crosstab (χωρίς απαρίθμηση ζευγών).
+    is_yes: συνάρτηση Series -> bool Series για τα ΖΩΗΡΟΣ/ΙΔΙΑΙΤΕΡΟΤΗΤΑ
+    (default: τιμή == "Ν" μετά από strip). Γραμμές χωρίς τμήμα αγνοούνται.
+    Επιστρέφει DataFrame με index το str(τμήμα) και στήλες ped_conflicts, conflict_sum.
+    """
+    if is_yes is None:
+        is_yes = lambda s: s.astype(str).str.strip() == "Ν"
+    flags = {}
+    for col in ("ΖΩΗΡΟΣ", "ΙΔΙΑΙΤΕΡΟΤΗΤΑ"):
+        flags[col] = is_yes(df[col]) if col in df.columns else pd.Series(False, index=df.index)
+    kind = pd.Series("-", index=df.index)
+    kind[flags["ΖΩΗΡΟΣ"].to_numpy(dtype=bool)] = "Z"
+    kind[flags["ΙΔΙΑΙΤΕΡΟΤΗΤΑ"].to_numpy(dtype=bool)] = "I"
+    placed = df[class_col].notna()
+    counts = pd.crosstab(df.loc[placed, class_col].astype(str), kind[placed]).reindex(
+        columns=["I", "Z"], fill_value=0
+    )
+    ped, total = conflict_scores(counts["I"], counts["Z"])
+    return pd.DataFrame({"ped_conflicts": ped, "conflict_sum": total}, index=counts.index)
 
 # --------- ΝΕΑ βοηθητικά για το minimal export ---------
 def extract_step1_id(step1_col_name: str) -> int:
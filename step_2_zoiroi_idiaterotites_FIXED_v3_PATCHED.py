@@ -7,6 +7,9 @@ Step 2 — Ζωηροί & Ιδιαιτερότητες (Fixed v3, patched)
 """
 from typing import List, Dict, Tuple, Any, Set, Optional
 import pandas as pd
+import heapq
+import time
+from functools import lru_cache
 import random
 import re
 
@@ -18,62 +21,13 @@ def _auto_num_classes(df, override=None):
     return int(k if override is None else override)
 
 from step_2_helpers_FIXED import (
-    normalize_columns, parse_friends_cell, scope_step2, mutual_pairs_in_scope
+    normalize_columns, parse_friends_cell, scope_step2, mutual_pairs_in_scope,
+    conflict_scores
 )
 
 RANDOM_SEED = 42
 random.seed(RANDOM_SEED)
 
-def _pair_conflict_penalty(aZ, aI, bZ, bI) -> int:
-    if aI and bI: return 5
-    if (aI and bZ) or (bI and aZ): return 4
-    if aZ and bZ: return 3
-    return 0
-
-def _count_ped_conflicts(df: pd.DataFrame, col: str) -> int:
-    cnt = 0
-    by_class = {}
-    for _, r in df.iterrows():
-        cl = r.get(col)
-        if pd.isna(cl): continue
-        by_class.setdefault(str(cl), []).append(r)
-    for _cl, rows in by_class.items():
-        for i in range(len(rows)):
-            for j in range(i + 1, len(rows)):
-                aZ = str(rows[i].get("ΖΩΗΡΟΣ", "")).strip() == "Ν"
-                aI = str(rows[i].get("ΙΔΙΑΙΤΕΡΟΤΗΤΑ", "")).strip() == "Ν"
-                bZ = str(rows[j].get("ΖΩΗΡΟΣ", "")).strip() == "Ν"
-                bI = str(rows[j].get("ΙΔΙΑΙΤΕΡΟΤΗΤΑ", "")).strip() == "Ν"
-                if _pair_conflict_penalty(aZ, aI, bZ, bI) > 0:
-                    cnt += 1
-    return cnt
-
-def _sum_conflicts(df: pd.DataFrame, col: str) -> int:
-    s = 0
-    by_class = {}
-    for _, r in df.iterrows():
-        cl = r.get(col)
-        if pd.isna(cl): continue
-        by_class.setdefault(str(cl), []).append(r)
-    for _cl, rows in by_class.items():
-        for i in range(len(rows)):
-            for j in range(i + 1, len(rows)):
-                aZ = str(rows[i].get("ΖΩΗΡΟΣ", "")).strip() == "Ν"
-                aI = str(rows[i].get("ΙΔΙΑΙΤΕΡΟΤΗΤΑ", "")).strip() == "Ν"
-                bZ = str(rows[j].get("ΖΩΗΡΟΣ", "")).strip() == "Ν"
-                bI = str(rows[j].get("ΙΔΙΑΙΤΕΡΟΤΗΤΑ", "")).strip() == "Ν"
-                s += _pair_conflict_penalty(aZ, aI, bZ, bI)
-    return s
-
-def _broken_mutual_pairs(df: pd.DataFrame, col: str, scope: Set[str]) -> int:
-    pairs = mutual_pairs_in_scope(df, scope)
-    name2class = {
-        str(r["ΟΝΟΜΑ"]).strip(): str(r.get(col))
-        for _, r in df.iterrows()
-        if pd.notna(r.get(col))
-    }
-    return sum(1 for a, b in pairs if name2class.get(a) != name2class.get(b))
-
 def _compute_targets_global(df: pd.DataFrame, step1_col: str, class_labels: List[str]) -> Dict[str, Dict[str, int]]:
     Z_step1 = {cl: 0 for cl in class_labels}
     I_step1 = {cl: 0 for cl in class_labels}
@@ -109,40 +63,104 @@ def _compute_targets_global(df: pd.DataFrame, step1_col: str, class_labels: List
         "I_step1": I_step1,
     }
 
-def _prereject(assign_map, next_name, next_cl, df, step1_col, class_labels, targets) -> bool:
-    Zc = targets["Z_step1"].copy()
-    Ic = targets["I_step1"].copy()
-    tmp = assign_map.copy()
-    if next_name and next_cl:
-        tmp[next_name] = next_cl
-
-    for n, cl in tmp.items():
-        row = df[df["ΟΝΟΜΑ"] == n].iloc[0]
-        if str(row.get("ΖΩΗΡΟΣ", "")).strip() == "Ν": Zc[cl] += 1
-        if str(row.get("ΙΔΙΑΙΤΕΡΟΤΗΤΑ", "")).strip() == "Ν": Ic[cl] += 1
-
-    for cl in class_labels:
-        if Zc[cl] > targets["Z"]["max"]: return False
-        if Ic[cl] > targets["I"]["max"]: return False
-
-    if next_name and next_cl and "ΣΥΓΚΡΟΥΣΗ" in df.columns:
-        mask_next = (df["ΟΝΟΜΑ"] == next_name)
-        next_conf_cell = df.loc[mask_next, "ΣΥΓΚΡΟΥΣΗ"]
-        toks_next = set(parse_friends_cell(next_conf_cell.values[0] if not next_conf_cell.empty else ""))
-
-        fixed_same = df[(pd.notna(df[step1_col])) & (df[step1_col] == next_cl)]
-        if any((n in toks_next) for n in fixed_same["ΟΝΟΜΑ"].astype(str).tolist()):
+def _compile_roster(df: pd.DataFrame, step1_col: str, class_labels: List[str]) -> Dict[str, Any]:
+    """
+    Μία φορά ανά κλήση: ο πίνακας γίνεται πίνακες με ακέραιους δείκτες (πρώτη γραμμή
+    κάθε ονόματος, όπως τα παλιά df[df["ΟΝΟΜΑ"] == n].iloc[0]).
+      Z / I:  σημαίες ζωηρού / ιδιαιτερότητας
+      conf:   bitset (Python int) των ονομάτων που γράφει στη ΣΥΓΚΡΟΥΣΗ
+      rconf:  bitset όσων τον γράφουν στη δική τους ΣΥΓΚΡΟΥΣΗ
+      fixed:  ανά τμήμα, bitset όσων έχουν ήδη τοποθετηθεί εκεί στο Βήμα 1
+      deg:    πλήθος ΣΥΓΚΡΟΥΣΗ + ΦΙΛΟΙ (για τη σειρά τοποθέτησης)
+    """
+    first = df.drop_duplicates(subset="ΟΝΟΜΑ", keep="first")
+    names = first["ΟΝΟΜΑ"].astype(str).tolist()
+    index = {n: i for i, n in enumerate(names)}
+    has_conf = "ΣΥΓΚΡΟΥΣΗ" in df.columns
+    conf_cells = first["ΣΥΓΚΡΟΥΣΗ"].tolist() if has_conf else [""] * len(names)
+    friend_cells = first["ΦΙΛΟΙ"].tolist() if "ΦΙΛΟΙ" in df.columns else [""] * len(names)
+
+    conf = [0] * len(names)
+    rconf = [0] * len(names)
+    deg = []
+    for i, (c_cell, f_cell) in enumerate(zip(conf_cells, friend_cells)):
+        toks = parse_friends_cell(c_cell)
+        deg.append(len(toks) + len(parse_friends_cell(f_cell)))
+        for t in set(toks):
+            j = index.get(t)
+            if j is not None:
+                conf[i] |= 1 << j
+                rconf[j] |= 1 << i
+
+    fixed = [0] * len(class_labels)
+    placed_names = df["ΟΝΟΜΑ"].astype(str)
+    for k, cl in enumerate(class_labels):
+        for n in placed_names[(pd.notna(df[step1_col])) & (df[step1_col] == cl)]:
+            fixed[k] |= 1 << index[n]
+
+    return {
+        "names": names,
+        "index": index,
+        "Z": (first["ΖΩΗΡΟΣ"].astype(str).str.strip() == "Ν").tolist(),
+        "I": (first["ΙΔΙΑΙΤΕΡΟΤΗΤΑ"].astype(str).str.strip() == "Ν").tolist(),
+        "conf": conf,
+        "rconf": rconf,
+        "fixed": fixed,
+        "deg": deg,
+        "has_conf": has_conf,
+    }
+
+def _prereject(roster: Dict[str, Any], state: Dict[str, List[int]], i: int, c: int, targets) -> bool:
+    """
+    True αν το παιδί i μπορεί να μπει στο τμήμα c: κανένα τμήμα πάνω από το max Ζ/Ι
+    και καμία ΣΥΓΚΡΟΥΣΗ με όσους είναι ήδη στο c (Βήμα 1 ή τρέχουσα ανάθεση).
+    state: τρέχοντες μετρητές Ζ/Ι ανά τμήμα (μαζί με το Βήμα 1) και bitset μελών.
+    """
+    z, ii = roster["Z"][i], roster["I"][i]
+    z_max, i_max = targets["Z"]["max"], targets["I"]["max"]
+    for k, (zc, ic) in enumerate(zip(state["Z"], state["I"])):
+        if k == c:
+            zc += z
+            ic += ii
+        if zc > z_max or ic > i_max:
             return False
 
-        for n2, cl2 in tmp.items():
-            if cl2 != next_cl: continue
-            mask_n2 = (df["ΟΝΟΜΑ"] == n2)
-            n2_conf_cell = df.loc[mask_n2, "ΣΥΓΚΡΟΥΣΗ"]
-            toks2 = set(parse_friends_cell(n2_conf_cell.values[0] if not n2_conf_cell.empty else ""))
-            if (next_name in toks2) or (n2 in toks_next):
-                return False
+    if roster["has_conf"]:
+        conf_i = roster["conf"][i]
+        if conf_i & roster["fixed"][c]:
+            return False
+        if (conf_i | roster["rconf"][i]) & (state["members"][c] | (1 << i)):
+            return False
     return True
 
+@lru_cache(maxsize=1 << 16)
+def _quota_penalty_lb(classes: Tuple[Tuple[int, int, int, int], ...], rem: Tuple[int, int, int],
+                      z_q: int, z_max: int, i_q: int, i_max: int) -> Optional[int]:
+    """
+    Κάτω φράγμα του penalty (Σ 3·C(m,2) + n_I·(m-1) ανά τμήμα) για ό,τι απομένει.
+    classes: (Ζ, Ι, m, n_I) ανά τμήμα· rem: πόσα ΖΙ / μόνο Ι / μόνο Ζ απομένουν.
+    DP πάνω στα πλήθη που παίρνει κάθε τμήμα, με τα q/max Ζ και Ι του Βήματος 2
+    (χωρίς ΣΥΓΚΡΟΥΣΗ και χωρίς ταυτότητα παιδιών). None αν τα όρια δεν καλύπτονται.
+    """
+    layer = {rem: 0}
+    for z, i, m, n_i in classes:
+        nxt: Dict[Tuple[int, int, int], int] = {}
+        for (r_zi, r_i, r_z), cost in layer.items():
+            for a in range(min(r_zi, z_max - z, i_max - i) + 1):
+                for b in range(min(r_i, i_max - i - a) + 1):
+                    if i + a + b < i_q:
+                        continue
+                    for c in range(min(r_z, z_max - z - a) + 1):
+                        if z + a + c < z_q:
+                            continue
+                        mm, nn = m + a + b + c, n_i + a + b
+                        key = (r_zi - a, r_i - b, r_z - c)
+                        val = cost + 3 * mm * (mm - 1) // 2 + nn * (mm - 1)
+                        if val < nxt.get(key, val + 1):
+                            nxt[key] = val
+        layer = nxt
+    return layer.get((0, 0, 0))
+
 def _extract_step1_id(step1_col_name: str) -> int:
     m = re.search(r'(?:ΒΗΜΑ1_|V1_)ΣΕΝΑΡΙΟ[_\s]*(\d+)', str(step1_col_name))
     return int(m.group(1)) if m else 1
@@ -154,11 +172,30 @@ def step2_apply_FIXED_v3(
     *,
     seed: int = 42,
     max_results: int = 5,
+    search: str = "bnb",
+    max_nodes: Optional[int] = None,
+    time_budget_s: Optional[float] = None,
 ) -> List[Tuple[str, pd.DataFrame, Dict[str, Any]]]:
     """
     Επιστρέφει έως max_results σενάρια ως (label, DataFrame, metrics).
     Το DataFrame περιέχει στήλες εισόδου + «ΒΗΜΑ2_ΣΕΝΑΡΙΟ_{k}» όπου k = id του ΒΗΜΑ1_ΣΕΝΑΡΙΟ_k.
+
+    search: "bnb" (branch-and-bound, default) ή "exhaustive" (όλα τα φύλλα).
+    Το bnb κόβει κλαδιά που δεν μπορούν να μπουν στα καλύτερα σενάρια (κάτω φράγμα
+    για ped_conflicts / σπασμένες / penalty) ή να καλύψουν το ελάχιστο Ζ/Ι ανά τμήμα,
+    και δοκιμάζει μόνο ένα από όσα τμήματα είναι ισοδύναμα στον τρέχοντα κόμβο.
+    Κρατά για κάθε παιδί τα τμήματα που επιτρέπονται ακόμη (όρια Ζ/Ι, ΣΥΓΚΡΟΥΣΗ),
+    κόβει μόλις αδειάσει κάποιο και τοποθετεί πρώτα όποιο έχει τα λιγότερα (DSATUR).
+    Το καλύτερο κλειδί είναι ίδιο με την εξαντλητική· οι ισοβαθμίες μπορεί να
+    διαφέρουν και δεν περιέχουν κατανομές που διαφέρουν μόνο στα ονόματα τμημάτων.
+
+    max_nodes / time_budget_s: όριο κόμβων / δευτερολέπτων για την αναζήτηση. Αν
+    εξαντληθεί, επιστρέφονται τα καλύτερα φύλλα που βρέθηκαν ως τότε ή, αν δεν
+    βρέθηκε κανένα, μία greedy συμπλήρωση (χωρίς εγγύηση για τα q Ζ/Ι).
+    Τα metrics περιέχουν επιπλέον nodes_expanded, prereject_pruned και search_complete.
     """
+    if search not in ("bnb", "exhaustive"):
+        raise ValueError(f"Άγνωστη μέθοδος αναζήτησης: {search}")
     random.seed(seed)
     df = normalize_columns(df_in).copy()
     num_classes = _auto_num_classes(df, num_classes)
@@ -168,99 +205,346 @@ def step2_apply_FIXED_v3(
     to_place = df[(pd.isna(df[step1_col_name])) & ((df["ΖΩΗΡΟΣ"] == "Ν") | (df["ΙΔΙΑΙΤΕΡΟΤΗΤΑ"] == "Ν"))]["ΟΝΟΜΑ"].astype(str).tolist()
     targets = _compute_targets_global(df, step1_col=step1_col_name, class_labels=class_labels)
 
-    best: List[Tuple[pd.DataFrame, int, int, int, int]] = []
+    # Top max_results φύλλα ως συμπαγή tuples κωδικών τμήματος (σειρά to_place_sorted).
+    # Κλειδί = ο κανόνας επιλογής: πρώτα όσα έχουν 0 παιδαγωγικές συγκρούσεις με
+    # (σπασμένες, penalty), αλλιώς (penalty, σπασμένες)· ισοβαθμίες με σειρά παραγωγής.
+    best: List[Tuple[Tuple[int, int, int], int, Tuple[int, ...], int, int, int]] = []
+    keep = max(1, max_results)
+    leaf_seq = [0]
     assign: Dict[str, str] = {}
+    codes: List[int] = []
+
+    roster = _compile_roster(df, step1_col_name, class_labels)
+    idx = roster["index"]
+    Zf, If, deg = roster["Z"], roster["I"], roster["deg"]
+    # Μετρητές ανά τμήμα (Βήμα 1 + τρέχουσα ανάθεση), ενημερώνονται σε push/pop
+    state = {
+        "Z": [targets["Z_step1"][cl] for cl in class_labels],
+        "I": [targets["I_step1"][cl] for cl in class_labels],
+        "members": [0] * num_classes,
+        "placed": [0] * num_classes,
+    }
+
+    # Για βαθμολόγηση χωρίς DataFrame: γραμμές Ζ/Ι με το τμήμα του Βήματος 1,
+    # και όνομα -> τμήμα (τελευταία γραμμή με τιμή)
+    step1_vals = df[step1_col_name]
+    zi_rows = [
+        (n, z, i_, None if pd.isna(cl) else str(cl))
+        for n, z, i_, cl in zip(
+            df["ΟΝΟΜΑ"].astype(str),
+            df["ΖΩΗΡΟΣ"].astype(str).str.strip() == "Ν",
+            df["ΙΔΙΑΙΤΕΡΟΤΗΤΑ"].astype(str).str.strip() == "Ν",
+            step1_vals,
+        )
+        if z or i_
+    ]
+    base_name2class = {
+        str(n).strip(): str(cl) for n, cl in zip(df["ΟΝΟΜΑ"], step1_vals) if pd.notna(cl)
+    }
+    pairs = mutual_pairs_in_scope(df, scope)
 
-    def deg(name: str) -> int:
-        row = df[df["ΟΝΟΜΑ"] == name].iloc[0]
-        return len(parse_friends_cell(row.get("ΣΥΓΚΡΟΥΣΗ", ""))) + len(parse_friends_cell(row.get("ΦΙΛΟΙ", "")))
+    def score_leaf() -> Tuple[int, int, int]:
+        counts: Dict[str, List[int]] = {}  # τμήμα -> [n_I, n_Z]
+        for n, z, i_, cl in zi_rows:
+            cl = assign.get(n, cl)
+            if cl is not None:
+                counts.setdefault(cl, [0, 0])[0 if i_ else 1] += 1
+        ped_cnt = conf_sum = 0
+        for n_I, n_Z in counts.values():
+            ped, pen = conflict_scores(n_I, n_Z)
+            ped_cnt += ped
+            conf_sum += pen
+        broken = sum(
+            1 for a, b in pairs
+            if assign.get(a, base_name2class.get(a)) != assign.get(b, base_name2class.get(b))
+        )
+        return ped_cnt, broken, conf_sum
 
     to_place_sorted = sorted(
         to_place,
         key=lambda n: (
-            -(
-                str(df.loc[df["ΟΝΟΜΑ"] == n, "ΖΩΗΡΟΣ"].values[0]).strip() == "Ν"
-                and str(df.loc[df["ΟΝΟΜΑ"] == n, "ΙΔΙΑΙΤΕΡΟΤΗΤΑ"].values[0]).strip() == "Ν"
-            ),
-            -(str(df.loc[df["ΟΝΟΜΑ"] == n, "ΙΔΙΑΙΤΕΡΟΤΗΤΑ"].values[0]).strip() == "Ν"),
-            -(str(df.loc[df["ΟΝΟΜΑ"] == n, "ΖΩΗΡΟΣ"].values[0]).strip() == "Ν"),
-            -deg(n),
+            -(Zf[idx[n]] and If[idx[n]]),
+            -If[idx[n]],
+            -Zf[idx[n]],
+            -deg[idx[n]],
         ),
     )
 
-    def backtrack(i: int) -> None:
-        if i == len(to_place_sorted):
-            cand = df.copy()
-            cand_col = "ΒΗΜΑ2_TMP"
-            cand[cand_col] = cand[step1_col_name]
-            for n, cl in assign.items():
-                cand.loc[cand["ΟΝΟΜΑ"] == n, cand_col] = cl
-
-            counts_new = {cl: 0 for cl in class_labels}
-            for cl in assign.values():
-                counts_new[cl] += 1
-            if sum(counts_new.values()) > 0 and max(counts_new.values()) == sum(counts_new.values()):
+    def push(i: int, c: int) -> None:
+        state["Z"][c] += Zf[i]
+        state["I"][c] += If[i]
+        state["members"][c] |= 1 << i
+        state["placed"][c] += 1
+
+    def pop(i: int, c: int) -> None:
+        state["Z"][c] -= Zf[i]
+        state["I"][c] -= If[i]
+        state["members"][c] &= ~(1 << i)
+        state["placed"][c] -= 1
+
+    # ---- Branch-and-bound: μετρητές φράγματος, domains, σχέσεις και ισοδυναμίες τμημάτων ----
+    # Με διπλότυπα ονόματα οι μετρητές του Βήματος 1 δεν αντιστοιχούν 1-1 στα φύλλα,
+    # οπότε μένει μόνο η εξαντλητική σειρά.
+    bnb = search == "bnb" and not df["ΟΝΟΜΑ"].astype(str).duplicated().any()
+    n_place = len(to_place_sorted)
+    codes[:] = [-1] * n_place  # τμήμα ανά θέση του to_place_sorted (-1: δεν τοποθετήθηκε)
+    pos_of = {n: p for p, n in enumerate(to_place_sorted)}
+    # Μετρητές όπως στο score_leaf: Ζ/Ι παιδιά (m) και όσα έχουν ιδιαιτερότητα (nI) ανά τμήμα
+    label_pos = {cl: k for k, cl in enumerate(class_labels)}
+    m_cnt = [0] * num_classes
+    i_cnt = [0] * num_classes
+    for n, z, i_, cl in zi_rows:
+        k = label_pos.get(cl)
+        if n not in pos_of and k is not None:
+            m_cnt[k] += 1
+            i_cnt[k] += i_
+    # Ζεύγη φίλων: όσα δεν αγγίζουν to_place είναι σταθερά· τα υπόλοιπα μετράνε όταν
+    # τοποθετηθεί και το δεύτερο άκρο τους (με όποια σειρά κι αν γίνει αυτό).
+    broken_base = 0
+    partners: List[List[Tuple[Optional[int], Optional[str]]]] = [[] for _ in range(n_place)]
+    rel = [0] * n_place  # bitset όσων «αφορούν» το παιδί (ΣΥΓΚΡΟΥΣΗ ή αμοιβαία φιλία)
+    for p, n in enumerate(to_place_sorted):
+        i = idx[n]
+        rel[p] = roster["conf"][i] | roster["rconf"][i] | (1 << i)
+    for a, b in pairs:
+        pa, pb = pos_of.get(a), pos_of.get(b)
+        if pa is None and pb is None:
+            broken_base += base_name2class.get(a) != base_name2class.get(b)
+            continue
+        for p, q, other in ((pa, pb, b), (pb, pa, a)):
+            if p is not None:
+                partners[p].append((q, base_name2class.get(other) if q is None else None))
+                if other in idx:
+                    rel[p] |= 1 << idx[other]
+    # Τύπος κάθε παιδιού για το φράγμα penalty: 0 = ΖΙ, 1 = μόνο Ι, 2 = μόνο Ζ
+    kind = [0 if (Zf[idx[n]] and If[idx[n]]) else (1 if If[idx[n]] else 2) for n in to_place_sorted]
+    rem_types = [kind.count(0), kind.count(1), kind.count(2)]
+    fixed = roster["fixed"]
+    broken_cur = [broken_base]
+    quotas = (targets["Z"]["q"], targets["Z"]["max"], targets["I"]["q"], targets["I"]["max"])
+    top: List[Any] = [None, 0]  # καλύτερο κλειδί μέχρι τώρα και πλήθος φύλλων σε αυτό
+
+    # Όρια αναζήτησης και μετρητές για τα metrics
+    stats = {"nodes_expanded": 0, "prereject_pruned": 0, "search_complete": True}
+    deadline = None if time_budget_s is None else time.monotonic() + max(0.0, time_budget_s)
+
+    # Domains (forward checking): bitset των τμημάτων που περνούν το _prereject για κάθε
+    # παιδί που απομένει. Μετά από push(i, c) αλλάζουν μόνο οι μετρητές του c (που μένουν
+    # ≤ max), άρα ξαναελέγχεται μόνο το bit c των υπολοίπων.
+    domains = [0] * n_place
+    if bnb:
+        for p, n in enumerate(to_place_sorted):
+            for c in range(num_classes):
+                if _prereject(roster, state, idx[n], c, targets):
+                    domains[p] |= 1 << c
+                else:
+                    stats["prereject_pruned"] += 1
+    with_partners = [p for p in range(n_place) if partners[p]]
+
+    def pending_broken() -> int:
+        # Όσοι απομένουν και έχουν ήδη τοποθετημένους αμοιβαίους φίλους σε διαφορετικά
+        # τμήματα: θα σπάσουν τουλάχιστον (φίλοι - μέγιστοι φίλοι σε ένα τμήμα)
+        extra = 0
+        for p in with_partners:
+            if codes[p] >= 0:
+                continue
+            per_class: Dict[Optional[str], int] = {}
+            for q, base_cl in partners[p]:
+                if q is not None:
+                    if codes[q] < 0:
+                        continue
+                    base_cl = class_labels[codes[q]]
+                per_class[base_cl] = per_class.get(base_cl, 0) + 1
+            if len(per_class) > 1:
+                extra += sum(per_class.values()) - max(per_class.values())
+        return extra
+
+    def penalty_lb() -> Optional[int]:
+        classes = tuple(sorted(zip(state["Z"], state["I"], m_cnt, i_cnt)))
+        return _quota_penalty_lb(classes, tuple(rem_types), *quotas)
+
+    def lower_bound(pen_lb: int) -> Tuple[int, int, int]:
+        # penalty 0 <=> καμία παιδαγωγική σύγκρουση, άρα και το ped_conflicts φράσσεται
+        broken = broken_cur[0] + pending_broken()
+        total_lb = pen_lb + 5 * broken
+        return (0, broken, total_lb) if pen_lb == 0 else (1, total_lb, broken)
+
+    def bnb_push(p: int, c: int) -> bool:
+        """Μετρητές φράγματος + forward checking· False αν αδειάσει κάποιο domain."""
+        i = idx[to_place_sorted[p]]
+        m_cnt[c] += 1
+        i_cnt[c] += If[i]
+        rem_types[kind[p]] -= 1
+        cl = class_labels[c]
+        delta = 0
+        for q, base_cl in partners[p]:
+            if q is None:
+                delta += base_cl != cl
+            elif codes[q] >= 0:
+                delta += class_labels[codes[q]] != cl
+        broken_cur[0] += delta
+        delta_stack.append(delta)
+        cleared: List[int] = []
+        ok = True
+        bit = 1 << c
+        for q in range(n_place):
+            if codes[q] < 0 and domains[q] & bit and not _prereject(roster, state, idx[to_place_sorted[q]], c, targets):
+                domains[q] &= ~bit
+                cleared.append(q)
+                stats["prereject_pruned"] += 1
+                ok = ok and domains[q] != 0
+        cleared_stack.append(cleared)
+        return ok
+
+    def bnb_pop(p: int, c: int) -> None:
+        i = idx[to_place_sorted[p]]
+        m_cnt[c] -= 1
+        i_cnt[c] -= If[i]
+        rem_types[kind[p]] += 1
+        broken_cur[0] -= delta_stack.pop()
+        bit = 1 << c
+        for q in cleared_stack.pop():
+            domains[q] |= bit
+
+    delta_stack: List[int] = []
+    cleared_stack: List[List[int]] = []
+
+    def out_of_budget() -> bool:
+        if not stats["search_complete"]:
+            return True
+        n = stats["nodes_expanded"]
+        if (max_nodes is not None and n >= max_nodes) or \
+                (deadline is not None and n % 256 == 0 and time.monotonic() >= deadline):
+            stats["search_complete"] = False
+            return True
+        return False
+
+    def place(p: int, c: int) -> None:
+        name = to_place_sorted[p]
+        assign[name] = class_labels[c]
+        codes[p] = c
+        push(idx[name], c)
+
+    def unplace(p: int, c: int) -> None:
+        name = to_place_sorted[p]
+        pop(idx[name], c)
+        codes[p] = -1
+        del assign[name]
+
+    def backtrack(pos: int) -> None:
+        if out_of_budget():
+            return
+        stats["nodes_expanded"] += 1
+        if bnb:
+            pen_lb = penalty_lb()
+            if pen_lb is None:
                 return
+            if top[0] is not None:
+                lb = lower_bound(pen_lb)
+                if lb > top[0] or (lb == top[0] and top[1] >= keep):
+                    return
+        if pos == len(to_place_sorted):
+            counts_new = state["placed"]
+            if sum(counts_new) > 0 and max(counts_new) == sum(counts_new):
+                return
+            for k in range(num_classes):
+                if not (targets["Z"]["q"] <= state["Z"][k] <= targets["Z"]["max"]): return
+                if not (targets["I"]["q"] <= state["I"][k] <= targets["I"]["max"]): return
 
-            Zc = targets["Z_step1"].copy()
-            Ic = targets["I_step1"].copy()
-            for n, cl in assign.items():
-                row = df[df["ΟΝΟΜΑ"] == n].iloc[0]
-                if str(row.get("ΖΩΗΡΟΣ", "")).strip() == "Ν": Zc[cl] += 1
-                if str(row.get("ΙΔΙΑΙΤΕΡΟΤΗΤΑ", "")).strip() == "Ν": Ic[cl] += 1
-            for cl in class_labels:
-                if not (targets["Z"]["q"] <= Zc[cl] <= targets["Z"]["max"]): return
-                if not (targets["I"]["q"] <= Ic[cl] <= targets["I"]["max"]): return
-
-            ped_cnt = _count_ped_conflicts(cand, cand_col)
-            conf_sum = _sum_conflicts(cand, cand_col)
-            broken = _broken_mutual_pairs(cand, cand_col, scope)
+            ped_cnt, broken, conf_sum = score_leaf()
             total = conf_sum + 5 * broken
-            best.append((cand, ped_cnt, broken, total, conf_sum))
+            rank = (0, broken, total) if ped_cnt == 0 else (1, total, broken)
+            item = (tuple(-r for r in rank), -leaf_seq[0], tuple(codes), ped_cnt, broken, total)
+            leaf_seq[0] += 1
+            if top[0] is None or rank < top[0]:
+                top[0], top[1] = rank, 1
+            elif rank == top[0]:
+                top[1] += 1
+            if len(best) < keep:
+                heapq.heappush(best, item)
+            elif item > best[0]:
+                heapq.heapreplace(best, item)
             return
 
-        name = to_place_sorted[i]
-        for cl in class_labels:
-            if not _prereject(assign, name, cl, df, step1_col_name, class_labels, targets):
-                continue
-            assign[name] = cl
-            backtrack(i + 1)
-            del assign[name]
+        if not bnb:
+            # Εξαντλητική: στατική σειρά to_place_sorted, έλεγχος με _prereject ανά τμήμα
+            i = idx[to_place_sorted[pos]]
+            for c in range(num_classes):
+                if not _prereject(roster, state, i, c, targets):
+                    stats["prereject_pruned"] += 1
+                    continue
+                place(pos, c)
+                backtrack(pos + 1)
+                unplace(pos, c)
+                if not stats["search_complete"]:
+                    break
+            return
 
-    backtrack(0)
+        # DSATUR: επόμενο το παιδί με τα λιγότερα επιτρεπτά τμήματα· ισοπαλίες με τη
+        # στατική σειρά (ΖΙ, Ι, Ζ, βαθμός)
+        p = min((q for q in range(n_place) if codes[q] < 0),
+                key=lambda q: (bin(domains[q]).count("1"), q))
+        live_rel = 0
+        for q in range(n_place):
+            if codes[q] < 0:
+                live_rel |= rel[q]
+        seen = set()
+        for c in range(num_classes):
+            if not domains[p] >> c & 1:
+                continue
+            if not ((fixed[c] | state["members"][c]) & live_rel):
+                # Τμήμα χωρίς σχέση με όσους απομένουν: ίδιοι μετρητές => ίδια υποδέντρα
+                sig = (state["Z"][c], state["I"][c], state["placed"][c], m_cnt[c], i_cnt[c])
+                if sig in seen:
+                    continue
+                seen.add(sig)
+            place(p, c)
+            if bnb_push(p, c):
+                backtrack(pos + 1)
+            bnb_pop(p, c)
+            unplace(p, c)
+            if not stats["search_complete"]:
+                break
+
+    def greedy_leaf() -> None:
+        # Κάθε παιδί στο τμήμα με τους λιγότερους Ζ/Ι που περνά το _prereject
+        # (αλλιώς σε οποιοδήποτε τμήμα)· βαθμολογείται όπως ένα κανονικό φύλλο.
+        for p, name in enumerate(to_place_sorted):
+            i = idx[name]
+            allowed = [c for c in range(num_classes) if _prereject(roster, state, i, c, targets)]
+            c = min(allowed or range(num_classes),
+                    key=lambda k: (state["Z"][k] + state["I"][k], state["placed"][k], k))
+            place(p, c)
+        ped_cnt, broken, conf_sum = score_leaf()
+        total = conf_sum + 5 * broken
+        rank = (0, broken, total) if ped_cnt == 0 else (1, total, broken)
+        best.append((tuple(-r for r in rank), 0, tuple(codes), ped_cnt, broken, total))
+
+    if not (bnb and not all(domains)):
+        backtrack(0)
+    if not best and not stats["search_complete"]:
+        greedy_leaf()
 
     if not best:
         tmp = df.copy()
         base_id = _extract_step1_id(step1_col_name)
         tmp[f"ΒΗΜΑ2_ΣΕΝΑΡΙΟ_{base_id}"] = tmp[step1_col_name]
-        return [("option_1", tmp, {"ped_conflicts": None, "broken": None, "penalty": None})]
-
-    zero_ped = [x for x in best if x[1] == 0]
-    selected = []
-
-    total_pairs = len(mutual_pairs_in_scope(df, scope))
-
-    if zero_ped:
-        min_broken = min(x[2] for x in zero_ped)
-        tier1 = [x for x in zero_ped if x[2] == min_broken]
-        min_total = min(x[3] for x in tier1)
-        tier2 = [x for x in tier1 if x[3] == min_total]
-        selected = tier2
-    else:
-        min_total = min(x[3] for x in best)
-        tier1 = [x for x in best if x[3] == min_total]
-        max_preserved = max(total_pairs - x[2] for x in tier1)
-        tier2 = [x for x in tier1 if (total_pairs - x[2]) == max_preserved]
-        selected = tier2
+        return [("option_1", tmp, {"ped_conflicts": None, "broken": None, "penalty": None, **stats})]
+
+    # Μόνο οι ισοβαθμίες στο καλύτερο κλειδί, με τη σειρά παραγωγής
+    best.sort(reverse=True)
+    selected = [x for x in best if x[0] == best[0][0]]
 
     results: List[Tuple[str, pd.DataFrame, Dict[str, Any]]] = []
     base_id = _extract_step1_id(step1_col_name)
-    for k, (cand, ped_cnt, broken, total, conf_sum) in enumerate(selected, start=1):
-        out = cand.copy()
-        final_col = f"ΒΗΜΑ2_ΣΕΝΑΡΙΟ_{base_id}"
-        out[final_col] = out["ΒΗΜΑ2_TMP"]
-        out.drop(columns=["ΒΗΜΑ2_TMP"], inplace=True)
+    final_col = f"ΒΗΜΑ2_ΣΕΝΑΡΙΟ_{base_id}"
+    for k, (_rank, _seq, leaf, ped_cnt, broken, total) in enumerate(selected, start=1):
+        # Το DataFrame υλοποιείται μόνο για τα τελικά σενάρια
+        out = df.copy()
+        out[final_col] = out[step1_col_name]
+        for n, c in zip(to_place_sorted, leaf):
+            out.loc[out["ΟΝΟΜΑ"] == n, final_col] = class_labels[c]
         results.append((f"option_{k}", out, {
-            "ped_conflicts": int(ped_cnt), "broken": int(broken), "penalty": int(total),
+            "ped_conflicts": int(ped_cnt), "broken": int(broken), "penalty": int(total), **stats,
         }))
     return results
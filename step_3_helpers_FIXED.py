@@ -10,6 +10,7 @@ step_3_helpers_FIXED.py
 """
 
 from typing import List, Tuple, Dict, Set
+from collections import Counter
 import pandas as pd
 import re, ast
 
@@ -43,13 +44,51 @@ def are_mutual_pair(df: pd.DataFrame, a: str, b: str) -> bool:
     fb = set(parse_friends_string(rb.iloc[0].get("ΦΙΛΟΙ","")))
     return (str(b).strip() in fa) and (str(a).strip() in fb)
 
+def mutual_friend_index(df: pd.DataFrame) -> Tuple[List[str], List[List[int]]]:
+    """
+    Δείκτης αμοιβαίων φιλιών ενός ρόστερ: (ονόματα ως str, adj), όπου adj[i] = θέσεις γραμμών
+    των αμοιβαίων φίλων της γραμμής i, με τη σειρά που εμφανίζονται στο ΦΙΛΟΙ (χωρίς διπλότυπα).
+    Κάθε κελί ΦΙΛΟΙ γίνεται parse μία φορά· για διπλότυπο ΟΝΟΜΑ ισχύει η πρώτη γραμμή,
+    όπως στο are_mutual_pair.
+    """
+    names = df["ΟΝΟΜΑ"].astype(str).tolist()
+    cells = df["ΦΙΛΟΙ"].tolist() if "ΦΙΛΟΙ" in df.columns else [""] * len(names)
+    first: Dict[str, int] = {}
+    for i, nm in enumerate(names):
+        first.setdefault(nm, i)
+    friends = {i: parse_friends_string(cells[i]) for i in first.values()}
+    fsets = {i: set(f) for i, f in friends.items()}
+
+    adj_first: Dict[int, List[int]] = {}
+    for i, flist in friends.items():
+        me = names[i].strip()
+        out: List[int] = []
+        for v in flist:
+            j = first.get(v)
+            if j is not None and me in fsets[j] and j not in out:
+                out.append(j)
+        adj_first[i] = out
+    return names, [adj_first[first[nm]] for nm in names]
+
 def mutual_dyads(df: pd.DataFrame) -> Set[Tuple[str,str]]:
-    names = df["ΟΝΟΜΑ"].astype(str).str.strip().tolist()
+    """
+    Αμοιβαίες ΔΥΑΔΕΣ (a, b) με a <= b, σε O(N + E): κάθε κελί ΦΙΛΟΙ γίνεται parse μία φορά
+    σε F[όνομα] (πρώτη γραμμή ανά ΟΝΟΜΑ, όπως στο are_mutual_pair) και δίνεται (a, b) όταν
+    b ∈ F[a] και a ∈ F[b]. Ίδιο αποτέλεσμα με are_mutual_pair σε κάθε ζεύγος γραμμών.
+    """
+    raw = df["ΟΝΟΜΑ"].astype(str).tolist()
+    cells = df["ΦΙΛΟΙ"].tolist() if "ΦΙΛΟΙ" in df.columns else [""] * len(raw)
+    first: Dict[str, int] = {}
+    for i, nm in enumerate(raw):
+        first.setdefault(nm, i)
+    # πλήθος γραμμών ανά (stripped) όνομα: η δυάδα (a, a) θέλει δύο γραμμές
+    counts = Counter(nm.strip() for nm in raw)
+    F = {a: set(parse_friends_string(cells[first[a]])) for a in counts if a in first}
     pairs: Set[Tuple[str,str]] = set()
-    for i, a in enumerate(names):
-        for b in names[i+1:]:
-            if are_mutual_pair(df, a, b):
-                pairs.add(tuple(sorted([a,b])))
+    for a, fa in F.items():
+        for b in fa:
+            if b in F and a in F[b] and (a != b or counts[a] > 1):
+                pairs.add((a, b) if a < b else (b, a))
     return pairs
 
 def count_broken_dyads(before_df: pd.DataFrame, after_df: pd.DataFrame, scenario_col: str) -> int: